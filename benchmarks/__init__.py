@@ -0,0 +1 @@
+"""Benchmarks for the Home Assistant Wine Cellar integration."""
@@ -0,0 +1,65 @@
+"""A local stand-in for cellartracker.CellarTracker."""
+from __future__ import annotations
+
+import csv
+from io import StringIO
+import time
+
+from cellartracker import cellartracker
+from cellartracker.enum import CellarTrackerTable
+from cellartracker.errors import AuthenticationError
+
+
+def to_tab_separated(rows: list[dict]) -> str:
+    """Encode rows the way CellarTracker exports them."""
+    if not rows:
+        return ""
+    buffer = StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=list(rows[0]), dialect="excel-tab")
+    writer.writeheader()
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+
+class FakeClient:
+    """Serve tables from memory after a configurable latency."""
+
+    def __init__(self, tables: dict[CellarTrackerTable, str], latency: float, authenticated: bool) -> None:
+        """Initialize the client."""
+        self.tables = tables
+        self.latency = latency
+        self.authenticated = authenticated
+        self.requests = 0
+
+    def get(self, table, format):
+        """Return a table as tab-separated text, like CellarTrackerClient.get."""
+        self.requests += 1
+        time.sleep(self.latency)
+        if not self.authenticated:
+            raise AuthenticationError("Invalid credentials")
+        return self.tables.get(table, "")
+
+
+class CellarTracker(cellartracker.CellarTracker):
+    """CellarTracker that serves a given inventory instead of calling cellartracker.com.
+
+    Responses go through the library's own tab-separated parser, so the
+    parsing cost of a real download is included.
+    """
+
+    def __init__(
+        self,
+        username=None,
+        password=None,
+        inventory: list[dict] | None = None,
+        latency: float = 0.0,
+        authenticated: bool = True,
+    ):
+        """Initialize the stand-in with an inventory and a latency in seconds per request."""
+        self.client = FakeClient({}, latency, authenticated)
+        self.set_inventory(inventory or [])
+
+    def set_inventory(self, inventory: list[dict]) -> None:
+        """Replace the inventory returned by get_inventory."""
+        self.client.tables[CellarTrackerTable.Inventory] = to_tab_separated(inventory)
+        self.client.tables[CellarTrackerTable.FoodTag] = "iFoodTag\tFoodTag\n1\tBeef\n"
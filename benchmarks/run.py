@@ -0,0 +1,250 @@
+"""Benchmark the Wine Cellar services, coordinator refresh and sensor attributes.
+
+Run from the repository root with Home Assistant and cellartracker installed:
+
+    python -m benchmarks.run --sizes 100 1000 10000 --output results.json
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from datetime import datetime, timezone
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+from typing import Any, Callable
+
+from custom_components.wine_cellar.const import (
+    ATTR_BIN,
+    ATTR_DIMENSIONS,
+    ATTR_EXPIRING_WITHIN,
+    ATTR_GROUP_BY,
+    ATTR_LIMIT,
+    ATTR_LOCATION,
+    ATTR_METRICS,
+    ATTR_PREFIX,
+    ATTR_QUERY,
+    ATTR_SORT_BY,
+    ATTR_SORT_ORDER,
+    CONF_ENGINE,
+    CONF_SERVICE_TIME_BUDGET,
+    DEFAULT_SUMMARY_METRICS,
+    ENGINE_PANDAS,
+    ENGINE_PYTHON,
+    SENSOR_DIMENSIONS,
+    SORT_ASCENDING,
+    SORT_DESCENDING,
+)
+from custom_components.wine_cellar.engine import ENGINES
+from custom_components.wine_cellar.inventory import SNAPSHOT_INDEXES, InventorySnapshot, inventory_hash
+from custom_components.wine_cellar.metrics import PerformanceMetrics
+from custom_components.wine_cellar.sensor import WineInventorySensor
+
+from .fake_cellartracker import CellarTracker
+from .synthetic import generate_inventory
+
+DEFAULT_SIZES = [100, 1000, 10000, 100000]
+
+# Services with the arguments they are benchmarked with, after schema defaults.
+SERVICES = {
+    "_get_inventory": {},
+    "_get_distinct_inventory": {},
+    "_get_countries": {},
+    "_get_drinking_window": {ATTR_EXPIRING_WITHIN: 2},
+    "_get_locations": {},
+    "_get_producers": {},
+    "_get_types": {},
+    "_get_varietals": {},
+    "_get_vintages": {},
+    "_lookup_bottle": {ATTR_LOCATION: "Cellar", ATTR_BIN: "A1"},
+    "_get_summary": {
+        ATTR_GROUP_BY: ["Country", "Type"],
+        ATTR_METRICS: DEFAULT_SUMMARY_METRICS,
+        ATTR_SORT_ORDER: SORT_ASCENDING,
+    },
+    "_get_summaries": {
+        ATTR_DIMENSIONS: ["Country", "Location", "Producer", "Type", "Varietal", "Vintage"],
+        ATTR_METRICS: DEFAULT_SUMMARY_METRICS,
+        ATTR_SORT_ORDER: SORT_ASCENDING,
+    },
+    "_get_top": {ATTR_SORT_BY: "Valuation", ATTR_SORT_ORDER: SORT_DESCENDING, ATTR_LIMIT: 10},
+    "_search_inventory": {ATTR_QUERY: "barolo giac", ATTR_LIMIT: 10, ATTR_PREFIX: True},
+}
+
+
+class _UncachedResults:
+    """Stand-in for ServiceResultCache that always computes."""
+
+    async def async_get(self, service, params, generation, compute):
+        return await compute()
+
+
+async def _run_inline(func, *args):
+    """Stand-in for hass.async_add_executor_job that runs the job in place."""
+    return func(*args)
+
+
+def _refresh(controller: CellarTracker, previous: InventorySnapshot | None, engine) -> InventorySnapshot:
+    """Repeat the work of MyCoordinator._async_update_data without Home Assistant."""
+    inventory = controller.get_inventory()
+    content_hash = inventory_hash(inventory)
+    generation = previous.generation + 1 if previous else 1
+    snapshot = InventorySnapshot.from_inventory(inventory, generation, content_hash)
+    engine.prepare(snapshot)
+    engine.aggregate(snapshot, list(SENSOR_DIMENSIONS))
+    if previous is not None:
+        snapshot.changes_since(previous)
+    return snapshot
+
+
+def measure(name: str, bottles: int, func: Callable[[], Any], repeat: int) -> dict:
+    """Return latency, allocation and peak memory statistics of a callable."""
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    result = func()
+    _, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated = sum(stat.count_diff for stat in after.compare_to(before, "filename") if stat.count_diff > 0)
+    del result
+
+    latencies.sort()
+    return {
+        "name": name,
+        "bottles": bottles,
+        "repeat": repeat,
+        "latency_ms": {
+            "min": round(latencies[0], 3),
+            "median": round(statistics.median(latencies), 3),
+            "mean": round(statistics.fmean(latencies), 3),
+            "p95": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3),
+            "max": round(latencies[-1], 3),
+        },
+        "allocated_blocks": allocated,
+        "peak_memory_bytes": peak,
+    }
+
+
+def measure_memory(controller: CellarTracker, bottles: int) -> dict:
+    """Return the memory held by the downloaded rows and by the snapshot built from them.
+
+    The snapshot is measured with its indexes, then again once they are
+    dropped, to tell the columns from the indexes.
+    """
+    tracemalloc.start()
+    inventory = controller.get_inventory()
+    raw, _ = tracemalloc.get_traced_memory()
+    snapshot = InventorySnapshot.from_inventory(inventory, 1)
+    del inventory
+    compact, _ = tracemalloc.get_traced_memory()
+    for index in SNAPSHOT_INDEXES:
+        # Indexes are cached properties, held in the instance dict.
+        del snapshot.__dict__[index]
+    columns, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del snapshot
+
+    return {
+        "name": "snapshot_memory",
+        "bottles": bottles,
+        "raw_bytes": raw,
+        "snapshot_bytes": compact,
+        "column_bytes": columns,
+        "index_bytes": compact - columns,
+        "saved_bytes": raw - compact,
+    }
+
+
+def run_size(bottles: int, engine_name: str, repeat: int, latency: float, seed: int) -> list[dict]:
+    """Benchmark every measured path on an inventory of the given size."""
+    engine = ENGINES[engine_name]
+    inventory = generate_inventory(bottles, seed)
+    controller = CellarTracker(inventory=inventory, latency=latency)
+    memory = measure_memory(controller, bottles)
+    previous = _refresh(controller, None, engine)
+
+    # Change a few bottles so that the refresh also has a diff to compute.
+    changed = [dict(bottle) for bottle in inventory]
+    for bottle in changed[:: max(1, bottles // 20)]:
+        bottle["Bin"] = "Moved"
+    controller.set_inventory(changed)
+
+    results = [memory, measure("coordinator_refresh", bottles, lambda: _refresh(controller, previous, engine), repeat)]
+    snapshot = previous
+
+    coordinator = SimpleNamespace(
+        data=snapshot,
+        engine=engine,
+        cache=_UncachedResults(),
+        metrics=PerformanceMetrics(),
+        aggregates=engine.aggregate(snapshot, list(SENSOR_DIMENSIONS)),
+    )
+    entry = SimpleNamespace(options={CONF_ENGINE: engine_name, CONF_SERVICE_TIME_BUDGET: float("inf")})
+    sensor = WineInventorySensor(entry, "benchmark", coordinator)
+    sensor.hass = SimpleNamespace(async_add_executor_job=_run_inline)
+
+    results.append(
+        measure("extra_state_attributes", bottles, lambda: sensor.extra_state_attributes, repeat)
+    )
+
+    loop = asyncio.new_event_loop()
+    try:
+        for service, kwargs in SERVICES.items():
+            method = getattr(sensor, service)
+            results.append(
+                measure(
+                    service.lstrip("_"), bottles, lambda: loop.run_until_complete(method(**kwargs)), repeat
+                )
+            )
+    finally:
+        loop.close()
+
+    return results
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run the benchmarks and write the results as JSON."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="inventory sizes in bottles")
+    parser.add_argument("--engine", choices=[ENGINE_PYTHON, ENGINE_PANDAS], default=ENGINE_PYTHON)
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per measurement")
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated CellarTracker latency in seconds")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic inventory")
+    parser.add_argument("--output", help="file to write the JSON results to, instead of stdout")
+    args = parser.parse_args(argv)
+
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "engine": args.engine,
+        "repeat": args.repeat,
+        "latency": args.latency,
+        "seed": args.seed,
+        "results": [],
+    }
+    for bottles in args.sizes:
+        report["results"].extend(run_size(bottles, args.engine, args.repeat, args.latency, args.seed))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
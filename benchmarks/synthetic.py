@@ -0,0 +1,160 @@
+"""Seeded synthetic CellarTracker inventories for benchmarks."""
+from __future__ import annotations
+
+import random
+
+from custom_components.wine_cellar.const import INVENTORY_FIELDS
+
+COUNTRIES = {
+    "France": {
+        "Bordeaux": ["Pauillac", "Margaux", "Saint-Émilion Grand Cru", "Pessac-Léognan"],
+        "Burgundy": ["Gevrey-Chambertin", "Meursault", "Chablis", "Pommard"],
+        "Rhône": ["Châteauneuf-du-Pape", "Côte-Rôtie", "Hermitage"],
+        "Champagne": ["Champagne"],
+    },
+    "Italy": {
+        "Piedmont": ["Barolo", "Barbaresco", "Barbera d'Alba"],
+        "Tuscany": ["Chianti Classico", "Brunello di Montalcino", "Bolgheri"],
+        "Veneto": ["Amarone della Valpolicella", "Soave"],
+    },
+    "USA": {
+        "California": ["Napa Valley", "Sonoma Coast", "Paso Robles"],
+        "Oregon": ["Willamette Valley"],
+        "Washington": ["Columbia Valley"],
+    },
+    "Spain": {
+        "Rioja": ["Rioja"],
+        "Castilla y León": ["Ribera del Duero", "Toro"],
+    },
+    "Australia": {
+        "South Australia": ["Barossa Valley", "McLaren Vale", "Coonawarra"],
+    },
+    "Germany": {
+        "Mosel": ["Mosel"],
+        "Rheingau": ["Rheingau"],
+    },
+}
+
+VARIETALS = [
+    ("Cabernet Sauvignon", "Cabernet Sauvignon", "Red", "Dry"),
+    ("Red Bordeaux Blend", "Cabernet Sauvignon", "Red", "Dry"),
+    ("Pinot Noir", "Pinot Noir", "Red", "Dry"),
+    ("Nebbiolo", "Nebbiolo", "Red", "Dry"),
+    ("Sangiovese", "Sangiovese", "Red", "Dry"),
+    ("Syrah", "Syrah", "Red", "Dry"),
+    ("Tempranillo", "Tempranillo", "Red", "Dry"),
+    ("Chardonnay", "Chardonnay", "White", "Dry"),
+    ("Riesling", "Riesling", "White", "Dry"),
+    ("Sauvignon Blanc", "Sauvignon Blanc", "White", "Dry"),
+    ("Champagne Blend", "Pinot Noir", "White", "Sparkling"),
+    ("Grenache Blend", "Grenache", "Rosé", "Dry"),
+    ("Sémillon", "Sémillon", "White", "Sweet/Dessert"),
+]
+
+PRODUCER_WORDS = [
+    "Château", "Domaine", "Tenuta", "Bodegas", "Weingut", "Cantina", "Giacomo",
+    "Montagne", "Rocca", "Vieux", "Clos", "Estate", "Ridge", "Valley", "Saint",
+    "Conterno", "Lafite", "Pierre", "Marcel", "Henschke", "Sorì", "Fontaine",
+]
+
+LOCATIONS = ["Basement", "Cellar", "Kitchen", "Garage", "Offsite"]
+SIZES = ["750ml", "750ml", "750ml", "1.5L", "375ml"]
+STORES = ["K&L", "Wine.com", "Winery", "Local Shop", "Auction", ""]
+SCORE_FIELDS = [
+    "WA", "WS", "IWC", "BH", "AG", "WE", "JR", "RH", "JG", "GV", "JK", "LD", "CW",
+    "WFW", "PR", "SJ", "WD", "RR", "JH", "MFW", "WWR", "IWR", "CHG", "TT", "TWF",
+    "DR", "FP", "JM", "PG", "WAL", "JS",
+]
+NOTE_WORDS = [
+    "cassis", "cherry", "tobacco", "leather", "tar", "roses", "mineral", "oak",
+    "silky", "tannic", "youthful", "decant", "gift", "anniversary", "dinner",
+]
+
+
+def _wine(rng: random.Random, iwine: int) -> dict:
+    """Return the fields shared by all bottles of one wine."""
+    country = rng.choice(list(COUNTRIES))
+    region = rng.choice(list(COUNTRIES[country]))
+    appellation = rng.choice(COUNTRIES[country][region])
+    varietal, master_varietal, color, category = rng.choice(VARIETALS)
+    producer = " ".join(rng.sample(PRODUCER_WORDS, 2))
+    vintage = 1001 if rng.random() < 0.03 else rng.randint(1970, 2022)
+    designation = rng.choice(["", "Riserva", "Reserve", "Grand Vin", "Old Vines"])
+    vineyard = rng.choice(["", "", "Cannubi", "Les Amoureuses", "To Kalon"])
+    begin = "" if vintage == 1001 or rng.random() < 0.2 else str(vintage + rng.randint(2, 10))
+    end = "" if not begin else str(int(begin) + rng.randint(3, 25))
+    valuation = rng.lognormvariate(3.8, 0.8)
+
+    wine = {field: "" for field in INVENTORY_FIELDS}
+    wine.update(
+        {
+            "iWine": str(iwine),
+            "Vintage": str(vintage),
+            "Wine": " ".join(part for part in (producer, designation, vineyard, appellation) if part),
+            "Locale": f"{country}, {region}, {appellation}",
+            "Country": country,
+            "Region": region,
+            "SubRegion": appellation if rng.random() < 0.5 else "Unknown",
+            "Appellation": appellation,
+            "Producer": producer,
+            "SortProducer": producer.split(" ", 1)[-1],
+            "Type": color,
+            "Color": color,
+            "Category": category,
+            "Varietal": varietal,
+            "MasterVarietal": master_varietal,
+            "Designation": designation or "Unknown",
+            "Vineyard": vineyard or "Unknown",
+            "Valuation": f"{valuation:.2f}",
+            "BeginConsume": begin,
+            "EndConsume": end,
+            "PurchasedCommunity": str(rng.randint(0, 5000)),
+            "QuantityCommunity": str(rng.randint(0, 3000)),
+            "PendingCommunity": str(rng.randint(0, 50)),
+            "ConsumedCommunity": str(rng.randint(0, 2000)),
+        }
+    )
+    for field in rng.sample(SCORE_FIELDS, rng.randint(0, 4)):
+        wine[field] = str(rng.randint(86, 100))
+    if rng.random() < 0.3:
+        wine["CT"] = f"{rng.uniform(85, 98):.1f}"
+    return wine
+
+
+def generate_inventory(bottles: int, seed: int = 0) -> list[dict]:
+    """Return a realistic inventory of the given number of bottles.
+
+    Bottles are grouped into wines of one to a dozen bottles, and every row
+    has all of the fields read by the integration, as strings, the way the
+    cellartracker library returns them.
+    """
+    rng = random.Random(seed)
+    inventory = []
+    iwine = 1000000
+    while len(inventory) < bottles:
+        iwine += rng.randint(1, 50)
+        wine = _wine(rng, iwine)
+        price = float(wine["Valuation"]) * rng.uniform(0.6, 1.2)
+        for _ in range(min(rng.choice([1, 1, 1, 2, 3, 6, 12]), bottles - len(inventory))):
+            bottle = dict(wine)
+            bottle.update(
+                {
+                    "Barcode": str(100000000 + len(inventory) * 7 + rng.randint(0, 6)),
+                    "Location": rng.choice(LOCATIONS),
+                    "Bin": f"{rng.choice('ABCDEFGH')}{rng.randint(1, 40)}",
+                    "Size": rng.choice(SIZES),
+                    "Currency": "USD",
+                    "ExchangeRate": "1",
+                    "Price": f"{price:.2f}" if rng.random() < 0.9 else "0",
+                    "NativePrice": f"{price:.2f}",
+                    "NativePriceCurrency": "USD",
+                    "StoreName": rng.choice(STORES),
+                    "PurchaseDate": f"{rng.randint(1, 12)}/{rng.randint(1, 28)}/{rng.randint(2000, 2024)}",
+                    "BottleNote": " ".join(rng.sample(NOTE_WORDS, 2)) if rng.random() < 0.1 else "",
+                    "CNotes": str(rng.randint(0, 40)),
+                    "PNotes": str(rng.randint(0, 3)),
+                    "MY": f"{rng.randint(85, 98)}" if rng.random() < 0.2 else "",
+                }
+            )
+            inventory.append(bottle)
+    return inventory
@@ -1,13 +1,16 @@
 """The Home Assistant Wine Cellar integration."""
 from __future__ import annotations
 
-from datetime import timedelta
+import asyncio
+from datetime import datetime, timedelta, timezone
+from functools import partial
 import logging
+import time
 import async_timeout
 
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import Platform
-from homeassistant.core import HomeAssistant, ServiceCall
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, ServiceCall, callback
 from homeassistant.const import CONF_USERNAME, CONF_PASSWORD
 from homeassistant.exceptions import ConfigEntryNotReady
 from homeassistant.exceptions import ConfigEntryAuthFailed
@@ -19,11 +22,47 @@ from homeassistant.helpers.update_coordinator import (
     UpdateFailed,
 )
 from homeassistant.helpers.entity_platform import async_get_platforms
+from homeassistant.helpers.event import async_call_later
 
 from cellartracker import cellartracker
 from cellartracker.errors import AuthenticationError, CannotConnect
 
-from .const import DOMAIN, POLL_SECONDS
+from .cache import ServiceResultCache
+from .const import (
+    CACHE_MAX_ENTRIES,
+    CONF_DOWNLOAD_TIMEOUT_MAX,
+    CONF_ENGINE,
+    CONF_POLL_INTERVAL_MAX,
+    CONF_POLL_INTERVAL_MIN,
+    CONF_SENSOR_DIMENSIONS,
+    CURSOR_SNAPSHOT_SECONDS,
+    CURSOR_SNAPSHOTS,
+    DATA_SCHEDULER,
+    DEFAULT_DOWNLOAD_TIMEOUT_MAX,
+    DEFAULT_ENGINE,
+    DEFAULT_POLL_INTERVAL_MAX,
+    DEFAULT_POLL_INTERVAL_MIN,
+    DEFAULT_SENSOR_DIMENSIONS,
+    DOMAIN,
+    DOWNLOAD_TIMEOUT_FACTOR,
+    DOWNLOAD_TIMEOUT_MIN,
+    EVENT_BOTTLE_ADDED,
+    EVENT_BOTTLE_MOVED,
+    EVENT_BOTTLE_REMOVED,
+    MAX_CONCURRENT_DOWNLOADS,
+    METRIC_DOWNLOAD,
+    METRIC_REFRESH,
+    POLL_SECONDS,
+    REFRESH_STAGGER_SECONDS,
+    RETRY_MAX_SECONDS,
+    RETRY_MIN_SECONDS,
+)
+from .engine import ENGINES, InventoryAggregates
+from .history import ValuationHistory
+from .inventory import InventoryChanges, InventorySnapshot, inventory_hash
+from .metrics import PerformanceMetrics
+from .scheduler import AdaptivePolling, RefreshScheduler
+from .store import InventoryStore
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -34,18 +73,34 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up Home Assistant Wine Cellar from a config entry."""
 
     hass.data.setdefault(DOMAIN, {})
+    scheduler = hass.data[DOMAIN].setdefault(
+        DATA_SCHEDULER,
+        RefreshScheduler(
+            MAX_CONCURRENT_DOWNLOADS, REFRESH_STAGGER_SECONDS, RETRY_MIN_SECONDS, RETRY_MAX_SECONDS
+        ),
+    )
+
+    controller = cellartracker.CellarTracker(entry.data[CONF_USERNAME], entry.data[CONF_PASSWORD])
+    coordinator = MyCoordinator(hass, controller, entry, scheduler)
+    # Also called when the setup fails, before it is retried.
+    entry.async_on_unload(partial(scheduler.async_unregister, entry.entry_id))
 
-    try:
-        controller = cellartracker.CellarTracker(entry.data[CONF_USERNAME], entry.data[CONF_PASSWORD])
+    entry.async_on_unload(coordinator.async_cancel_expiry)
 
-        # Request some data to validate username/password.
-        await hass.async_add_executor_job(controller.get_food_tag)
+    await coordinator.history.async_load()
 
-    except (AuthenticationError, CannotConnect) as exc:
-        _LOGGER.error(f"Unable to connect to Cellar Tracker controller: {str(exc)}")
-        raise ConfigEntryNotReady
+    # Serve the last good inventory right away if there is one, and
+    # revalidate it against CellarTracker in the background.
+    cached = await coordinator.async_load_cache()
+
+    if not cached:
+        try:
+            # Request some data to validate username/password.
+            await hass.async_add_executor_job(controller.get_food_tag)
 
-    coordinator = MyCoordinator(hass, controller)
+        except (AuthenticationError, CannotConnect) as exc:
+            _LOGGER.error(f"Unable to connect to Cellar Tracker controller: {str(exc)}")
+            raise ConfigEntryNotReady
 
     hass.data[DOMAIN][entry.entry_id] = {
             "coordinator": coordinator,
@@ -53,9 +108,15 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         }
 
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    entry.async_on_unload(entry.add_update_listener(async_reload_entry))
 
-    # Fetch initial data
-    await coordinator.async_config_entry_first_refresh()
+    if cached:
+        entry.async_create_background_task(
+            hass, coordinator.async_staggered_refresh(), f"{DOMAIN} {entry.entry_id} refresh"
+        )
+    else:
+        # Fetch initial data
+        await coordinator.async_config_entry_first_refresh()
 
     return True
 
@@ -63,7 +124,7 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
 class MyCoordinator(DataUpdateCoordinator):
     """My custom coordinator."""
 
-    def __init__(self, hass, controller):
+    def __init__(self, hass, controller, entry, scheduler: RefreshScheduler):
         """Initialize my coordinator."""
         super().__init__(
             hass,
@@ -74,30 +135,221 @@ class MyCoordinator(DataUpdateCoordinator):
         )
         self._hass = hass
         self._controller = controller
+        self._entry = entry
+        self._scheduler = scheduler
+        # Delay added once to the polls of this account, to stagger it from the others.
+        self._stagger = scheduler.async_register(entry.entry_id)
+        options = entry.options
+        self.polling = AdaptivePolling(
+            POLL_SECONDS,
+            options.get(CONF_POLL_INTERVAL_MIN, DEFAULT_POLL_INTERVAL_MIN) * 60,
+            options.get(CONF_POLL_INTERVAL_MAX, DEFAULT_POLL_INTERVAL_MAX) * 60,
+            DOWNLOAD_TIMEOUT_MIN,
+            options.get(CONF_DOWNLOAD_TIMEOUT_MAX, DEFAULT_DOWNLOAD_TIMEOUT_MAX),
+            DOWNLOAD_TIMEOUT_FACTOR,
+        )
+        self._generation = 0
+        # Previous snapshots by generation, oldest first, still served to paging
+        # cursors for CURSOR_SNAPSHOT_SECONDS after they were replaced.
+        self._previous: dict[int, InventorySnapshot] = {}
+        # Cancels the timer that drops each previous snapshot, by generation.
+        self._expiry: dict[int, CALLBACK_TYPE] = {}
+        self._store = InventoryStore(hass, entry.entry_id)
+        self.cache = ServiceResultCache(CACHE_MAX_ENTRIES)
+        self.metrics = PerformanceMetrics()
+        self.history = ValuationHistory(hass, entry.entry_id)
+        # Time of the last successful download from CellarTracker.
+        self.last_synced: datetime | None = None
+        # Aggregations of the current snapshot for the sensors, computed once per refresh.
+        self.aggregates: InventoryAggregates | None = None
+        self.sensor_dimensions: list[str] = options.get(CONF_SENSOR_DIMENSIONS, DEFAULT_SENSOR_DIMENSIONS)
+
+    @property
+    def engine(self):
+        """Return the aggregation engine selected in the options."""
+        return ENGINES[self._entry.options.get(CONF_ENGINE, DEFAULT_ENGINE)]
+
+    async def async_load_cache(self) -> bool:
+        """Load the last good inventory from local storage, if there is one."""
+        snapshot = await self._store.async_load(self._generation + 1)
+        if snapshot is None:
+            return False
 
-    async def _async_update_data(self):
+        aggregates = await self._hass.async_add_executor_job(self._prepare, snapshot)
+        self._generation = snapshot.generation
+        # The inventory is only stored when it changes, so it may have been
+        # confirmed by CellarTracker long after it was fetched.
+        self.last_synced = await self._store.async_load_synced() or snapshot.fetched
+        self.aggregates = aggregates
+        self.async_set_updated_data(snapshot)
+        return True
+
+    def get_snapshot(self, generation: int) -> InventorySnapshot | None:
+        """Return the current or a recent previous snapshot of a generation, if it is kept."""
+        if self.data is not None and self.data.generation == generation:
+            return self.data
+        return self._previous.get(generation)
+
+    async def async_staggered_refresh(self) -> None:
+        """Refresh once the offset of this account has passed.
+
+        Accounts started together from their cache then do not all download
+        their inventory at the same moment.
+        """
+        delay, self._stagger = self._stagger, 0
+        await asyncio.sleep(delay)
+        await self.async_refresh()
+
+    async def _async_update_data(self) -> InventorySnapshot:
         """Fetch data from API endpoint.
 
-        This is the place to pre-process the data to lookup tables
-        so entities can quickly look up their data.
+        The inventory is parsed once into an immutable, typed snapshot
+        that is shared by the sensor attributes and all services. When the
+        content has not changed, the previous snapshot is kept so that its
+        indexes and cached service responses stay valid.
+
+        Downloads wait for a slot of the shared scheduler. A failed refresh
+        is retried after the backoff of this account rather than at the next
+        poll. Otherwise the next poll is sooner after a change and later while
+        the inventory stays the same, and the timeout follows the size and
+        duration of the previous downloads.
         """
-        try:
-            # Note: asyncio.TimeoutError and aiohttp.ClientError are already
-            # handled by the data update coordinator.
-            async with async_timeout.timeout(10):
-                return await self._hass.async_add_executor_job(self._controller.get_inventory)
+        async with self._scheduler.async_download() as hold:
+            start = time.monotonic()
+            try:
+                # Note: asyncio.TimeoutError and aiohttp.ClientError are already
+                # handled by the data update coordinator.
+                async with async_timeout.timeout(self.polling.timeout):
+                    inventory = await hold(
+                        self._hass.async_add_executor_job(self._controller.get_inventory)
+                    )
+
+            except AuthenticationError as err:
+                # Raising ConfigEntryAuthFailed will cancel future updates
+                # and start a config flow with SOURCE_REAUTH (async_step_reauth)
+                raise ConfigEntryAuthFailed from err
+            except CannotConnect as err:
+                self._retry_later()
+                raise UpdateFailed(f"Error communicating with API: {err}")
+            except asyncio.TimeoutError:
+                self.polling.async_timed_out()
+                self._retry_later()
+                raise
 
-        except AuthenticationError as err:
-            # Raising ConfigEntryAuthFailed will cancel future updates
-            # and start a config flow with SOURCE_REAUTH (async_step_reauth)
-            raise ConfigEntryAuthFailed from err
-        except CannotConnect as err:
-            raise UpdateFailed(f"Error communicating with API: {err}")
+        self._scheduler.async_succeeded(self._entry.entry_id)
+        self.last_synced = datetime.now(timezone.utc)
+        downloaded = time.monotonic() - start
+        self.metrics.async_record(METRIC_DOWNLOAD, downloaded, len(inventory))
+        self.polling.async_downloaded(downloaded, len(inventory))
+
+        previous = self.data
+        snapshot = await self._async_process_inventory(inventory)
+        if previous is not None:
+            self.polling.async_refreshed(snapshot is not previous)
+        self.update_interval = timedelta(seconds=self.polling.interval + self._stagger)
+        self._stagger = 0
+        self.history.async_append(self.last_synced, self.aggregates)
+        await self._store.async_save_synced(self.last_synced)
+        self.metrics.async_record(METRIC_REFRESH, time.monotonic() - start, len(inventory))
+        return snapshot
+
+    def _retry_later(self) -> None:
+        """Schedule the next refresh after the backoff delay of this account."""
+        self.update_interval = timedelta(seconds=self._scheduler.async_failed(self._entry.entry_id))
+
+    async def _async_process_inventory(self, inventory: list[dict]) -> InventorySnapshot:
+        """Turn a downloaded inventory into a snapshot, reusing the previous one if unchanged."""
+        content_hash = await self._hass.async_add_executor_job(inventory_hash, inventory)
+        previous: InventorySnapshot | None = self.data
+        if previous is not None and previous.content_hash == content_hash:
+            return previous
+
+        self._generation += 1
+        snapshot = await self._hass.async_add_executor_job(
+            InventorySnapshot.from_inventory, inventory, self._generation, content_hash
+        )
+        aggregates = await self._hass.async_add_executor_job(self._prepare, snapshot)
+
+        if previous is not None:
+            changes = await self._hass.async_add_executor_job(snapshot.changes_since, previous)
+            self._fire_change_events(previous, snapshot, changes)
+
+        # Responses computed from the previous snapshot are no longer valid.
+        self.cache.invalidate()
+        self.aggregates = aggregates
+        if previous is not None:
+            self._previous[previous.generation] = previous
+            self._expiry[previous.generation] = async_call_later(
+                self._hass, CURSOR_SNAPSHOT_SECONDS, partial(self._async_expire_snapshot, previous.generation)
+            )
+            while len(self._previous) > CURSOR_SNAPSHOTS:
+                generation = next(iter(self._previous))
+                del self._previous[generation]
+                self._expiry.pop(generation)()
+        await self._store.async_save(snapshot)
+        return snapshot
+
+    @callback
+    def _async_expire_snapshot(self, generation: int, _now: datetime) -> None:
+        """Drop a previous snapshot once its cursors have had time to page through it."""
+        self._previous.pop(generation, None)
+        self._expiry.pop(generation, None)
+
+    @callback
+    def async_cancel_expiry(self) -> None:
+        """Cancel the timers of the previous snapshots, when the entry is unloaded."""
+        for cancel in self._expiry.values():
+            cancel()
+        self._expiry.clear()
+
+    def _prepare(self, snapshot: InventorySnapshot) -> InventoryAggregates:
+        """Prepare a new snapshot and return its aggregations. Runs in the executor."""
+        self.engine.prepare(snapshot)
+        return self.engine.aggregate(snapshot, self.sensor_dimensions)
+
+    def _fire_change_events(
+        self, previous: InventorySnapshot, snapshot: InventorySnapshot, changes: InventoryChanges
+    ) -> None:
+        """Fire an event on the bus for each bottle added, removed or moved."""
+        def event_data(bottle: dict) -> dict:
+            return {
+                "entry_id": self._entry.entry_id,
+                "iWine": bottle["iWine"],
+                "Barcode": bottle["Barcode"],
+                "Wine": bottle["Wine"],
+                "Vintage": bottle["Vintage"],
+                "Location": bottle["Location"],
+                "Bin": bottle["Bin"],
+            }
+
+        for index in changes.added:
+            self._hass.bus.async_fire(EVENT_BOTTLE_ADDED, event_data(snapshot.bottles[index]))
+        for index in changes.removed:
+            self._hass.bus.async_fire(EVENT_BOTTLE_REMOVED, event_data(previous.bottles[index]))
+        for old_index, new_index in changes.moved:
+            before = previous.bottles[old_index]
+            data = event_data(snapshot.bottles[new_index])
+            data["previous_location"] = before["Location"]
+            data["previous_bin"] = before["Bin"]
+            self._hass.bus.async_fire(EVENT_BOTTLE_MOVED, data)
 
 
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     if unload_ok := await hass.config_entries.async_unload_platforms(entry, PLATFORMS):
-        hass.data[DOMAIN].pop(entry.entry_id)
+        coordinator = hass.data[DOMAIN].pop(entry.entry_id)["coordinator"]
+        # Write the pending history before the entry can be removed.
+        await coordinator.history.async_flush()
 
     return unload_ok
+
+
+async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Reload a config entry after its options have changed."""
+    await hass.config_entries.async_reload(entry.entry_id)
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove the local inventory cache and valuation history of a deleted config entry."""
+    await InventoryStore(hass, entry.entry_id).async_remove()
+    await ValuationHistory(hass, entry.entry_id).async_remove()
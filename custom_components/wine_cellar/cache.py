@@ -0,0 +1,77 @@
+"""Service response cache for the Home Assistant Wine Cellar integration."""
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict
+from collections.abc import Callable, Coroutine, Hashable
+from functools import partial
+from typing import Any
+
+
+def _freeze(value: Any) -> Hashable:
+    """Return a hashable, order-independent form of service call parameters."""
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+class ServiceResultCache:
+    """Bounded LRU cache of service responses for one coordinator.
+
+    Entries are keyed by service name, call parameters and the generation of
+    the inventory snapshot they were computed from. Identical calls that
+    arrive while a result is being computed wait for that computation
+    instead of starting their own. The computation runs in its own task, so
+    that cancelling one caller leaves it running for the others.
+    """
+
+    def __init__(self, max_entries: int) -> None:
+        """Initialize an empty cache holding at most max_entries results."""
+        self._max_entries = max_entries
+        self._entries: OrderedDict[Hashable, Any] = OrderedDict()
+        self._pending: dict[Hashable, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        """Return the number of cached results."""
+        return len(self._entries)
+
+    async def async_get(
+        self,
+        service: str,
+        params: dict[str, Any],
+        generation: int,
+        compute: Callable[[], Coroutine[Any, Any, Any]],
+    ) -> Any:
+        """Return the cached result for a call, computing it if needed."""
+        key = (service, _freeze(params), generation)
+
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+        task = self._pending.get(key)
+        if task is None:
+            task = asyncio.get_running_loop().create_task(compute())
+            self._pending[key] = task
+            task.add_done_callback(partial(self._computed, key))
+        return await asyncio.shield(task)
+
+    def _computed(self, key: Hashable, task: asyncio.Task) -> None:
+        """Store the result of a finished computation, unless it failed."""
+        del self._pending[key]
+        # Retrieving the exception also marks it as retrieved if every caller was cancelled.
+        if not task.cancelled() and task.exception() is None:
+            self._store(key, task.result())
+
+    def invalidate(self) -> None:
+        """Drop all cached results, e.g. after the inventory has been refreshed."""
+        self._entries.clear()
+
+    def _store(self, key: Hashable, result: Any) -> None:
+        """Store a result, evicting the least recently used entries."""
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
@@ -1,21 +1,41 @@
 """Config flow for Home Assistant Wine Cellar integration."""
 from __future__ import annotations
 
+from importlib.util import find_spec
 import logging
 from typing import Any
 
 import voluptuous as vol
 
 from homeassistant import config_entries
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.data_entry_flow import FlowResult
 from homeassistant.exceptions import HomeAssistantError
 from homeassistant.const import CONF_USERNAME, CONF_PASSWORD
+from homeassistant.helpers import config_validation as cv
 
 from cellartracker import cellartracker
 from cellartracker.errors import AuthenticationError, CannotConnect
 
-from .const import DOMAIN
+from .const import (
+    CONF_DOWNLOAD_TIMEOUT_MAX,
+    CONF_ENGINE,
+    CONF_POLL_INTERVAL_MAX,
+    CONF_POLL_INTERVAL_MIN,
+    CONF_SENSOR_DIMENSIONS,
+    CONF_SERVICE_TIME_BUDGET,
+    DEFAULT_DOWNLOAD_TIMEOUT_MAX,
+    DEFAULT_ENGINE,
+    DEFAULT_POLL_INTERVAL_MAX,
+    DEFAULT_POLL_INTERVAL_MIN,
+    DEFAULT_SENSOR_DIMENSIONS,
+    DEFAULT_SERVICE_TIME_BUDGET,
+    DOMAIN,
+    DOWNLOAD_TIMEOUT_MIN,
+    ENGINE_PANDAS,
+    ENGINE_PYTHON,
+    SENSOR_DIMENSIONS,
+)
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -46,6 +66,14 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
     VERSION = 1
 
+    @staticmethod
+    @callback
+    def async_get_options_flow(
+        config_entry: config_entries.ConfigEntry,
+    ) -> config_entries.OptionsFlow:
+        """Create the options flow."""
+        return OptionsFlowHandler(config_entry)
+
     async def async_step_user(
         self, user_input: dict[str, Any] | None = None
     ) -> FlowResult:
@@ -67,3 +95,58 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         return self.async_show_form(
             step_id="user", data_schema=STEP_USER_DATA_SCHEMA, errors=errors
         )
+
+
+class OptionsFlowHandler(config_entries.OptionsFlow):
+    """Handle options for Home Assistant Wine Cellar."""
+
+    def __init__(self, config_entry: config_entries.ConfigEntry) -> None:
+        """Initialize options flow."""
+        self._entry = config_entry
+
+    async def async_step_init(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Manage the options."""
+        errors: dict[str, str] = {}
+        if user_input is not None:
+            if user_input[CONF_ENGINE] == ENGINE_PANDAS and find_spec("pandas") is None:
+                errors[CONF_ENGINE] = "pandas_unavailable"
+            elif user_input[CONF_POLL_INTERVAL_MIN] > user_input[CONF_POLL_INTERVAL_MAX]:
+                errors[CONF_POLL_INTERVAL_MIN] = "poll_interval_range"
+            else:
+                return self.async_create_entry(title="", data=user_input)
+
+        options = self._entry.options
+        return self.async_show_form(
+            step_id="init",
+            errors=errors,
+            data_schema=vol.Schema(
+                {
+                    vol.Required(
+                        CONF_ENGINE,
+                        default=options.get(CONF_ENGINE, DEFAULT_ENGINE),
+                    ): vol.In([ENGINE_PYTHON, ENGINE_PANDAS]),
+                    vol.Required(
+                        CONF_SERVICE_TIME_BUDGET,
+                        default=options.get(CONF_SERVICE_TIME_BUDGET, DEFAULT_SERVICE_TIME_BUDGET),
+                    ): vol.All(vol.Coerce(float), vol.Range(min=0.01)),
+                    vol.Required(
+                        CONF_POLL_INTERVAL_MIN,
+                        default=options.get(CONF_POLL_INTERVAL_MIN, DEFAULT_POLL_INTERVAL_MIN),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=1)),
+                    vol.Required(
+                        CONF_POLL_INTERVAL_MAX,
+                        default=options.get(CONF_POLL_INTERVAL_MAX, DEFAULT_POLL_INTERVAL_MAX),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=1)),
+                    vol.Required(
+                        CONF_DOWNLOAD_TIMEOUT_MAX,
+                        default=options.get(CONF_DOWNLOAD_TIMEOUT_MAX, DEFAULT_DOWNLOAD_TIMEOUT_MAX),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=DOWNLOAD_TIMEOUT_MIN)),
+                    vol.Required(
+                        CONF_SENSOR_DIMENSIONS,
+                        default=options.get(CONF_SENSOR_DIMENSIONS, DEFAULT_SENSOR_DIMENSIONS),
+                    ): cv.multi_select({dimension: dimension for dimension in SENSOR_DIMENSIONS}),
+                }
+            ),
+        )
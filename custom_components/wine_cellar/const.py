@@ -1,27 +1,280 @@
 """Constants for the Home Assistant Wine Cellar integration."""
+from enum import IntFlag
+
 from homeassistant.const import CONF_PASSWORD, CONF_USERNAME
 import voluptuous as vol
 from homeassistant.helpers import config_validation as cv
 
 DOMAIN = "wine_cellar"
 POLL_SECONDS = 3600
+STORAGE_VERSION = 1
+
+# Ages after which the valuation history keeps one point per day, then one per month.
+HISTORY_RAW_SECONDS = 7 * 24 * 3600
+HISTORY_DAY_SECONDS = 400 * 24 * 3600
+# Seconds to wait before saving the valuation history, to coalesce writes.
+HISTORY_SAVE_DELAY = 60
+
+# Key of the refresh scheduler shared by all accounts in hass.data[DOMAIN].
+DATA_SCHEDULER = "scheduler"
+
+# Maximum number of inventories downloaded at once, over all accounts.
+MAX_CONCURRENT_DOWNLOADS = 2
+# Seconds between the polls of accounts set up together.
+REFRESH_STAGGER_SECONDS = 60
+# Bounds of the delay before retrying a failed refresh.
+RETRY_MIN_SECONDS = 60
+RETRY_MAX_SECONDS = POLL_SECONDS
+
+# Bounds of the download timeout, and its multiple of the expected download time.
+DOWNLOAD_TIMEOUT_MIN = 10
+DOWNLOAD_TIMEOUT_FACTOR = 3
+
+# Maximum number of service responses kept per account.
+CACHE_MAX_ENTRIES = 32
+
+# Number of previous snapshots kept per account, and for how long after they
+# were replaced, so that paging cursors stay valid across refreshes.
+CURSOR_SNAPSHOTS = 2
+CURSOR_SNAPSHOT_SECONDS = 600
+
+EVENT_BOTTLE_ADDED = "wine_cellar_bottle_added"
+EVENT_BOTTLE_MOVED = "wine_cellar_bottle_moved"
+EVENT_BOTTLE_REMOVED = "wine_cellar_bottle_removed"
+
+# Names of the measured operations besides the services.
+METRIC_DOWNLOAD = "download"
+METRIC_REFRESH = "refresh"
+
+CONF_ENGINE = "engine"
+CONF_SERVICE_TIME_BUDGET = "service_time_budget"
+DEFAULT_SERVICE_TIME_BUDGET = 0.5
+
+# Bounds of the adaptive polling interval, in minutes, and of the download timeout, in seconds.
+CONF_POLL_INTERVAL_MIN = "poll_interval_min"
+CONF_POLL_INTERVAL_MAX = "poll_interval_max"
+CONF_DOWNLOAD_TIMEOUT_MAX = "download_timeout_max"
+DEFAULT_POLL_INTERVAL_MIN = 15
+DEFAULT_POLL_INTERVAL_MAX = 360
+DEFAULT_DOWNLOAD_TIMEOUT_MAX = 120
+
+# Fields that can be broken down into one sensor per value, chosen in the options.
+CONF_SENSOR_DIMENSIONS = "sensor_dimensions"
+SENSOR_DIMENSIONS = ("Location", "Type", "Color", "Category", "Country", "Varietal", "Size")
+DEFAULT_SENSOR_DIMENSIONS: list[str] = []
+
+ENGINE_PANDAS = "pandas"
+ENGINE_PYTHON = "python"
+DEFAULT_ENGINE = ENGINE_PYTHON
+
+# Fields of each bottle returned by get_inventory, in response order.
+INVENTORY_FIELDS = (
+    "iWine", "Barcode", "Location", "Bin", "Size", "Currency", "ExchangeRate",
+    "Valuation", "Price", "NativePrice", "NativePriceCurrency", "StoreName",
+    "PurchaseDate", "BottleNote", "Vintage", "Wine", "Locale", "Country",
+    "Region", "SubRegion", "Appellation", "Producer", "SortProducer", "Type",
+    "Color", "Category", "Varietal", "MasterVarietal", "Designation",
+    "Vineyard", "WA", "WS", "IWC", "BH", "AG", "WE", "JR", "RH", "JG", "GV",
+    "JK", "LD", "CW", "WFW", "PR", "SJ", "WD", "RR", "JH", "MFW", "WWR", "IWR",
+    "CHG", "TT", "TWF", "DR", "FP", "JM", "PG", "WAL", "JS", "CT", "CNotes",
+    "MY", "PNotes", "BeginConsume", "EndConsume", "PurchasedCommunity",
+    "QuantityCommunity", "PendingCommunity", "ConsumedCommunity",
+)
+
+# get_inventory filters on categorical columns, keyed by service field.
+INVENTORY_FILTER_COLUMNS = {
+    "location": "Location",
+    "bin": "Bin",
+    "size": "Size",
+    "store_name": "StoreName",
+    "country": "Country",
+    "region": "Region",
+    "sub_region": "SubRegion",
+    "appellation": "Appellation",
+    "producer": "Producer",
+    "type": "Type",
+    "color": "Color",
+    "category": "Category",
+    "varietal": "Varietal",
+    "master_varietal": "MasterVarietal",
+}
 
-SCHEMA_SERVICE_GET_COUNTRIES = {}
-SCHEMA_SERVICE_GET_INVENTORY = {}
-SCHEMA_SERVICE_GET_DISTINCT_INVENTORY = {}
-SCHEMA_SERVICE_GET_LOCATIONS = {}
-SCHEMA_SERVICE_GET_PRODUCERS = {}
-SCHEMA_SERVICE_GET_TYPES = {}
-SCHEMA_SERVICE_GET_VARIETALS = {}
-SCHEMA_SERVICE_GET_VINTAGES = {}
+ATTR_BARCODE = "barcode"
+ATTR_BIN = "bin"
+ATTR_CONSUME_FROM = "consume_from"
+ATTR_CONSUME_TO = "consume_to"
+ATTR_CURSOR = "cursor"
+ATTR_EXPIRING_WITHIN = "expiring_within"
+ATTR_FIELDS = "fields"
+ATTR_FILENAME = "filename"
+ATTR_FORMAT = "format"
+ATTR_VALUATION_MAX = "valuation_max"
+ATTR_VALUATION_MIN = "valuation_min"
+ATTR_VINTAGE_MAX = "vintage_max"
+ATTR_VINTAGE_MIN = "vintage_min"
+ATTR_YEAR = "year"
+
+ATTR_DIMENSIONS = "dimensions"
+ATTR_END = "end"
+ATTR_GROUP_BY = "group_by"
+ATTR_LIMIT = "limit"
+ATTR_LOCATION = "location"
+ATTR_METRICS = "metrics"
+ATTR_PREFIX = "prefix"
+ATTR_QUERY = "query"
+ATTR_RESOLUTION = "resolution"
+ATTR_SORT_BY = "sort_by"
+ATTR_SORT_ORDER = "sort_order"
+ATTR_START = "start"
+
+RESOLUTION_DAY = "day"
+RESOLUTION_MONTH = "month"
+
+# Formats of export_inventory, which writes to EXPORT_DIRECTORY under the
+# configuration directory, EXPORT_CHUNK_SIZE bottles at a time.
+EXPORT_CSV = "csv"
+EXPORT_JSONL = "jsonl"
+EXPORT_PARQUET = "parquet"
+EXPORT_FORMATS = (EXPORT_CSV, EXPORT_JSONL, EXPORT_PARQUET)
+EXPORT_DIRECTORY = DOMAIN
+EXPORT_CHUNK_SIZE = 1000
+
+# Number of wines returned by search_inventory unless a limit is given.
+DEFAULT_SEARCH_LIMIT = 10
+
+SORT_ASCENDING = "asc"
+SORT_DESCENDING = "desc"
+
+# Numeric columns that can be aggregated by get_summary, keyed by metric prefix.
+SUMMARY_FIELDS = {"valuation": "Valuation", "price": "Price"}
+SUMMARY_AGGREGATES = ("sum", "mean", "min", "max", "median")
+METRIC_COUNT = "count"
+METRIC_PERCENT = "percent"
+SUMMARY_METRICS = (
+    METRIC_COUNT,
+    METRIC_PERCENT,
+    *(f"{field}_{aggregate}" for field in SUMMARY_FIELDS for aggregate in SUMMARY_AGGREGATES),
+)
+DEFAULT_SUMMARY_METRICS = [METRIC_COUNT, "valuation_sum", "valuation_mean", METRIC_PERCENT]
+
+# Typed columns that bottles can be ranked by with get_top.
+TOP_FIELDS = ("Valuation", "Price", "Vintage", "BeginConsume", "EndConsume", "PurchaseDate")
+
+# Number of bottles returned by get_top unless a limit is given.
+DEFAULT_TOP_LIMIT = 10
+
+# Fields of the group summaries returned by get_countries, get_locations and the like.
+GROUP_SUMMARY_FIELDS = ("count", "value_total", "value_avg", "percent")
+
+SCHEMA_GROUP_SUMMARY = {
+    vol.Optional(ATTR_SORT_BY): vol.In(GROUP_SUMMARY_FIELDS),
+    vol.Optional(ATTR_SORT_ORDER, default=SORT_ASCENDING): vol.In([SORT_ASCENDING, SORT_DESCENDING]),
+    vol.Optional(ATTR_LIMIT): cv.positive_int,
+}
+SCHEMA_INVENTORY_FILTERS = {
+    **{
+        vol.Optional(attr): vol.All(cv.ensure_list, [cv.string])
+        for attr in INVENTORY_FILTER_COLUMNS
+    },
+    vol.Optional(ATTR_VINTAGE_MIN): vol.Coerce(int),
+    vol.Optional(ATTR_VINTAGE_MAX): vol.Coerce(int),
+    vol.Optional(ATTR_VALUATION_MIN): vol.Coerce(float),
+    vol.Optional(ATTR_VALUATION_MAX): vol.Coerce(float),
+    vol.Optional(ATTR_CONSUME_FROM): vol.Coerce(int),
+    vol.Optional(ATTR_CONSUME_TO): vol.Coerce(int),
+    vol.Optional(ATTR_FIELDS): vol.All(cv.ensure_list, [vol.In(INVENTORY_FIELDS)]),
+}
+
+SCHEMA_SERVICE_EXPORT_INVENTORY = {
+    **SCHEMA_INVENTORY_FILTERS,
+    vol.Optional(ATTR_FORMAT, default=EXPORT_CSV): vol.In(EXPORT_FORMATS),
+    vol.Optional(ATTR_FILENAME): cv.string,
+}
+SCHEMA_SERVICE_GET_COUNTRIES = SCHEMA_GROUP_SUMMARY
+SCHEMA_SERVICE_GET_INVENTORY = {
+    **SCHEMA_INVENTORY_FILTERS,
+    vol.Optional(ATTR_LIMIT): cv.positive_int,
+    vol.Optional(ATTR_CURSOR): cv.string,
+}
+SCHEMA_SERVICE_GET_DISTINCT_INVENTORY = {
+    vol.Optional(ATTR_LIMIT): cv.positive_int,
+    vol.Optional(ATTR_CURSOR): cv.string,
+}
+SCHEMA_SERVICE_GET_DRINKING_WINDOW = {
+    vol.Optional(ATTR_YEAR): vol.Coerce(int),
+    vol.Optional(ATTR_EXPIRING_WITHIN): vol.All(vol.Coerce(int), vol.Range(min=0)),
+    vol.Optional(ATTR_FIELDS): vol.All(cv.ensure_list, [vol.In(INVENTORY_FIELDS)]),
+}
+SCHEMA_SERVICE_GET_HISTORY = {
+    vol.Optional(ATTR_START): cv.datetime,
+    vol.Optional(ATTR_END): cv.datetime,
+    vol.Optional(ATTR_RESOLUTION): vol.In([RESOLUTION_DAY, RESOLUTION_MONTH]),
+    vol.Optional(ATTR_DIMENSIONS): vol.All(cv.ensure_list, [vol.In(SENSOR_DIMENSIONS)]),
+}
+SCHEMA_SERVICE_GET_LOCATIONS = SCHEMA_GROUP_SUMMARY
+SCHEMA_SERVICE_GET_SUMMARY = {
+    vol.Required(ATTR_GROUP_BY): vol.All(cv.ensure_list, vol.Length(min=1), [vol.In(INVENTORY_FIELDS)]),
+    vol.Optional(ATTR_METRICS, default=DEFAULT_SUMMARY_METRICS): vol.All(
+        cv.ensure_list, vol.Length(min=1), [vol.In(SUMMARY_METRICS)]
+    ),
+    vol.Optional(ATTR_SORT_BY): cv.string,
+    vol.Optional(ATTR_SORT_ORDER, default=SORT_ASCENDING): vol.In([SORT_ASCENDING, SORT_DESCENDING]),
+    vol.Optional(ATTR_LIMIT): cv.positive_int,
+}
+SCHEMA_SERVICE_GET_SUMMARIES = {
+    vol.Required(ATTR_DIMENSIONS): vol.All(cv.ensure_list, vol.Length(min=1), [vol.In(INVENTORY_FIELDS)]),
+    vol.Optional(ATTR_METRICS, default=DEFAULT_SUMMARY_METRICS): vol.All(
+        cv.ensure_list, vol.Length(min=1), [vol.In(SUMMARY_METRICS)]
+    ),
+    vol.Optional(ATTR_SORT_BY): vol.In(SUMMARY_METRICS),
+    vol.Optional(ATTR_SORT_ORDER, default=SORT_ASCENDING): vol.In([SORT_ASCENDING, SORT_DESCENDING]),
+    vol.Optional(ATTR_LIMIT): cv.positive_int,
+}
+SCHEMA_SERVICE_GET_PRODUCERS = SCHEMA_GROUP_SUMMARY
+SCHEMA_SERVICE_GET_TOP = {
+    **SCHEMA_INVENTORY_FILTERS,
+    vol.Optional(ATTR_SORT_BY, default="Valuation"): vol.In(TOP_FIELDS),
+    vol.Optional(ATTR_SORT_ORDER, default=SORT_DESCENDING): vol.In([SORT_ASCENDING, SORT_DESCENDING]),
+    vol.Optional(ATTR_LIMIT, default=DEFAULT_TOP_LIMIT): cv.positive_int,
+}
+SCHEMA_SERVICE_GET_TYPES = SCHEMA_GROUP_SUMMARY
+SCHEMA_SERVICE_GET_VARIETALS = SCHEMA_GROUP_SUMMARY
+SCHEMA_SERVICE_GET_VINTAGES = SCHEMA_GROUP_SUMMARY
+SCHEMA_SERVICE_LOOKUP_BOTTLE = {
+    vol.Optional(ATTR_BARCODE): cv.string,
+    vol.Optional(ATTR_LOCATION): cv.string,
+    vol.Optional(ATTR_BIN): cv.string,
+    vol.Optional(ATTR_FIELDS): vol.All(cv.ensure_list, [vol.In(INVENTORY_FIELDS)]),
+}
 SCHEMA_SERVICE_REFRESH_INVENTORY = {}
+SCHEMA_SERVICE_SEARCH_INVENTORY = {
+    vol.Required(ATTR_QUERY): cv.string,
+    vol.Optional(ATTR_LIMIT, default=DEFAULT_SEARCH_LIMIT): cv.positive_int,
+    vol.Optional(ATTR_PREFIX, default=True): cv.boolean,
+}
+
+
+class WineCellarEntityFeature(IntFlag):
+    """Features of the Wine Cellar entities."""
+
+    # The entity answers the inventory services.
+    INVENTORY = 1
+
 
+SERVICE_EXPORT_INVENTORY = "export_inventory"
 SERVICE_GET_COUNTRIES = "get_countries"
 SERVICE_GET_INVENTORY = "get_inventory"
 SERVICE_GET_DISTINCT_INVENTORY = "get_distinct_inventory"
+SERVICE_GET_DRINKING_WINDOW = "get_drinking_window"
+SERVICE_GET_HISTORY = "get_history"
 SERVICE_GET_LOCATIONS = "get_locations"
 SERVICE_GET_PRODUCERS = "get_producers"
+SERVICE_GET_SUMMARIES = "get_summaries"
+SERVICE_GET_SUMMARY = "get_summary"
+SERVICE_GET_TOP = "get_top"
 SERVICE_GET_TYPES = "get_types"
 SERVICE_GET_VARIETALS = "get_varietals"
 SERVICE_GET_VINTAGES = "get_vintages"
+SERVICE_LOOKUP_BOTTLE = "lookup_bottle"
 SERVICE_REFRESH_INVENTORY = "refresh_inventory"
+SERVICE_SEARCH_INVENTORY = "search_inventory"
@@ -0,0 +1,38 @@
+"""Diagnostics support for the Home Assistant Wine Cellar integration."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_PASSWORD, CONF_USERNAME
+from homeassistant.core import HomeAssistant
+
+from .const import DATA_SCHEDULER, DOMAIN
+
+TO_REDACT = {CONF_PASSWORD, CONF_USERNAME}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    coordinator = hass.data[DOMAIN][entry.entry_id]["coordinator"]
+    snapshot = coordinator.data
+
+    return {
+        "entry": {
+            "data": async_redact_data(entry.data, TO_REDACT),
+            "options": dict(entry.options),
+        },
+        "inventory": {
+            "bottles": len(snapshot) if snapshot is not None else None,
+            "generation": snapshot.generation if snapshot is not None else None,
+            "fetched": snapshot.fetched.isoformat() if snapshot is not None else None,
+            "last_synced": coordinator.last_synced.isoformat() if coordinator.last_synced else None,
+            "cached_responses": len(coordinator.cache),
+        },
+        "scheduler": hass.data[DOMAIN][DATA_SCHEDULER].as_dict(entry.entry_id),
+        "polling": coordinator.polling.as_dict(),
+        "metrics": coordinator.metrics.as_dict(),
+    }
@@ -0,0 +1,378 @@
+"""Aggregation engines for the Home Assistant Wine Cellar integration."""
+from __future__ import annotations
+
+from collections.abc import Iterable
+from dataclasses import dataclass
+import heapq
+import itertools
+import statistics
+
+from .const import (
+    ENGINE_PANDAS,
+    ENGINE_PYTHON,
+    METRIC_COUNT,
+    METRIC_PERCENT,
+    SUMMARY_FIELDS,
+)
+from .inventory import InventorySnapshot
+
+# Metrics of the get_countries, get_locations, ... summaries, keyed by their field in the response.
+GROUP_SUMMARY_METRICS = {
+    "count": METRIC_COUNT,
+    "value_total": "valuation_sum",
+    "value_avg": "valuation_mean",
+    "percent": METRIC_PERCENT,
+}
+
+# Metrics of the per-dimension sensors.
+DIMENSION_SENSOR_METRICS = [METRIC_COUNT, "valuation_sum", "valuation_mean"]
+
+# Columns of the snapshot DataFrame holding Price and Valuation unrounded.
+UNROUNDED_COLUMNS = {"Price": "price", "Valuation": "valuation"}
+
+
+@dataclass(frozen=True)
+class InventoryAggregates:
+    """Aggregations of a snapshot computed once per refresh and shared by the sensors.
+
+    summary holds the bottle count, total and average value of the inventory,
+    and dimensions the count, value_total and value_avg of each group, keyed by
+    dimension and then by the group value as a string.
+    """
+
+    generation: int
+    summary: dict
+    dimensions: dict[str, dict[str, dict]]
+
+
+def _split_metric(metric: str) -> tuple[str, str]:
+    """Split a metric such as valuation_median into its column and aggregate."""
+    field, aggregate = metric.rsplit("_", 1)
+    return SUMMARY_FIELDS[field], aggregate
+
+
+def _aggregate(values: list[float], aggregate: str) -> float:
+    """Return an aggregate of values the way pandas does, NaN if there are none."""
+    if aggregate == "sum":
+        return float(sum(values))
+    if not values:
+        return float("nan")
+    if aggregate == "mean":
+        return sum(values) / len(values)
+    if aggregate == "min":
+        return min(values)
+    if aggregate == "max":
+        return max(values)
+    return float(statistics.median(values))
+
+
+def _metric_fields(metrics: list[str]) -> list[str]:
+    """Return the numeric columns needed by metrics, in a stable order."""
+    return sorted({_split_metric(metric)[0] for metric in metrics if metric not in (METRIC_COUNT, METRIC_PERCENT)})
+
+
+def _scan(
+    snapshot: InventorySnapshot, keys: list[Iterable[tuple]], fields: list[str], rounded: bool = False
+) -> list[dict[tuple, list]]:
+    """Count the bottles and collect the values of fields per group of each key column.
+
+    All groupings are filled in one pass over the bottles, and the values are
+    converted, and rounded if asked, once per bottle rather than once per
+    grouping. Each group holds the bottle count, then the non-empty values of
+    each field.
+    """
+    typed = {"Valuation": snapshot.valuation, "Price": snapshot.price}
+    # Empty values are NaN in the typed columns, and the only values unequal to themselves.
+    if fields:
+        values = [
+            tuple(None if value != value else round(value, 0) if rounded else value for value in row)
+            for row in zip(*(typed[field] for field in fields))
+        ]
+    else:
+        values = itertools.repeat((), len(snapshot))
+
+    groupings: list[dict[tuple, list]] = [{} for _ in keys]
+    for row, *bottle_keys in zip(values, *keys):
+        for groups, key in zip(groupings, bottle_keys):
+            stats = groups.get(key)
+            if stats is None:
+                stats = groups[key] = [0] + [[] for _ in fields]
+            stats[0] += 1
+            for position, value in enumerate(row, 1):
+                if value is not None:
+                    stats[position].append(value)
+    return groupings
+
+
+def _metric(stats: list, metric: str, fields: list[str], bottles: int) -> float:
+    """Return a metric of a group collected by _scan."""
+    if metric == METRIC_COUNT:
+        return stats[0]
+    if metric == METRIC_PERCENT:
+        return stats[0] / bottles * 100
+    field, aggregate = _split_metric(metric)
+    return _aggregate(stats[fields.index(field) + 1], aggregate)
+
+
+def _results(
+    groups: dict[tuple, list],
+    group_by: list[str],
+    fields: list[str],
+    metrics: list[str],
+    sort_by: str | None = None,
+    descending: bool = False,
+    limit: int | None = None,
+) -> list[dict]:
+    """Return the metrics of groups collected by _scan, sorted by their keys or by sort_by.
+
+    Groups with an empty key are left out, as pandas does. Groups are ranked
+    on their raw stats and, with a limit, selected with a heap of that size,
+    so that only the rows returned are built.
+    """
+    groups = {key: stats for key, stats in groups.items() if None not in key}
+    bottles = sum(stats[0] for stats in groups.values())
+
+    items = groups.items()
+    if sort_by is None:
+        ranked = heapq.nsmallest(limit, items) if limit is not None else sorted(items)
+    elif sort_by in group_by:
+        # Keys are strings, which cannot be negated for a heap, so they are sorted in full.
+        position = group_by.index(sort_by)
+        ranked = sorted(sorted(items), key=lambda item: item[0][position], reverse=descending)[:limit]
+    else:
+        def rank(item: tuple[tuple, list]) -> tuple:
+            # Empty aggregates are NaN, unequal to themselves, and ranked last.
+            value = _metric(item[1], sort_by, fields, bottles)
+            if value != value:
+                return (1, 0, item[0])
+            return (0, -value if descending else value, item[0])
+
+        ranked = heapq.nsmallest(limit, items, key=rank) if limit is not None else sorted(items, key=rank)
+
+    summary = []
+    for key, stats in ranked:
+        result = dict(zip(group_by, key))
+        for metric in metrics:
+            result[metric] = _metric(stats, metric, fields, bottles)
+        summary.append(result)
+    return summary
+
+
+class AggregationEngine:
+    """Base class of the aggregation engines.
+
+    summarize and summarize_many aggregate Price and Valuation as they are,
+    or rounded to whole units with rounded. The inventory summary, the group
+    summaries and the sensors aggregate them rounded, as presented there.
+    Groups are returned sorted by their keys.
+    """
+
+    def prepare(self, snapshot: InventorySnapshot) -> None:
+        """Prepare a new snapshot for aggregation. Runs in the executor."""
+
+    def summary(self, snapshot: InventorySnapshot) -> dict:
+        """Return bottle count, total and average value of the inventory."""
+        raise NotImplementedError
+
+    def summarize(
+        self,
+        snapshot: InventorySnapshot,
+        group_by: list[str],
+        metrics: list[str],
+        sort_by: str | None = None,
+        descending: bool = False,
+        limit: int | None = None,
+        rounded: bool = False,
+    ) -> list[dict]:
+        """Return the given metrics for each group of bottles.
+
+        Each row holds the group_by columns and the requested metrics.
+        Aggregates of groups without any value are NaN. Groups are sorted by
+        their keys, or by sort_by, a group_by column or metric, with empty
+        values last and ties in key order, and only the first limit are kept.
+        """
+        raise NotImplementedError
+
+    def summarize_many(
+        self,
+        snapshot: InventorySnapshot,
+        dimensions: list[str],
+        metrics: list[str],
+        sort_by: str | None = None,
+        descending: bool = False,
+        limit: int | None = None,
+        rounded: bool = False,
+    ) -> dict[str, list[dict]]:
+        """Return the given metrics for each group of every dimension, keyed by dimension.
+
+        Every dimension is in the result, with no groups for an empty inventory.
+        """
+        return {
+            dimension: self.summarize(snapshot, [dimension], metrics, sort_by, descending, limit, rounded)
+            for dimension in dimensions
+        }
+
+    def aggregate(self, snapshot: InventorySnapshot, dimensions: list[str]) -> InventoryAggregates:
+        """Return the aggregations of the sensors, with all dimensions in one summarize_many."""
+        def values(row: dict) -> dict:
+            average = float(row["valuation_mean"])
+            return {
+                "count": int(row[METRIC_COUNT]),
+                "value_total": float(row["valuation_sum"]),
+                "value_avg": round(average, 0) if average == average else None,
+            }
+
+        summaries = self.summarize_many(snapshot, dimensions, DIMENSION_SENSOR_METRICS, rounded=True)
+        return InventoryAggregates(
+            generation=snapshot.generation,
+            summary=self.summary(snapshot),
+            dimensions={
+                dimension: {str(row[dimension]): values(row) for row in rows}
+                for dimension, rows in summaries.items()
+            },
+        )
+
+    def group_summary(
+        self,
+        snapshot: InventorySnapshot,
+        group: str,
+        sort_by: str | None = None,
+        descending: bool = False,
+        limit: int | None = None,
+    ) -> list[dict]:
+        """Return count, value total, value average and percent of bottles per group.
+
+        Groups may be sorted by one of these fields and limited in number.
+        """
+        if not len(snapshot):
+            return []
+        metrics = list(GROUP_SUMMARY_METRICS.values())
+        rows = self.summarize(
+            snapshot, [group], metrics, GROUP_SUMMARY_METRICS.get(sort_by), descending, limit, rounded=True
+        )
+        return [
+            {
+                group: row[group],
+                "count": float(row[METRIC_COUNT]),
+                "value_total": row["valuation_sum"],
+                "value_avg": round(row["valuation_mean"], 0),
+                "percent": round(row[METRIC_PERCENT], 0),
+            }
+            for row in rows
+        ]
+
+
+class PythonEngine(AggregationEngine):
+    """Aggregate the inventory with plain Python.
+
+    The results are identical to those of PandasEngine, without the cost of
+    importing pandas.
+    """
+
+    def summary(self, snapshot: InventorySnapshot) -> dict:
+        """Return bottle count, total and average value of the inventory."""
+        values = [round(value, 0) for value in snapshot.valuation if value == value]
+        total = sum(values)
+        return {
+            "total_bottles": len(snapshot),
+            "total_value": int(round(total, 0)),
+            "average_value": int(round(total / len(values), 0)) if values else 0,
+        }
+
+    def summarize(
+        self,
+        snapshot: InventorySnapshot,
+        group_by: list[str],
+        metrics: list[str],
+        sort_by: str | None = None,
+        descending: bool = False,
+        limit: int | None = None,
+        rounded: bool = False,
+    ) -> list[dict]:
+        """Return the given metrics for each group of bottles, in a single scan."""
+        fields = _metric_fields(metrics if sort_by is None or sort_by in group_by else [*metrics, sort_by])
+        keys = zip(*(snapshot.column(column) for column in group_by))
+        (groups,) = _scan(snapshot, [keys], fields, rounded)
+        return _results(groups, group_by, fields, metrics, sort_by, descending, limit)
+
+    def summarize_many(
+        self,
+        snapshot: InventorySnapshot,
+        dimensions: list[str],
+        metrics: list[str],
+        sort_by: str | None = None,
+        descending: bool = False,
+        limit: int | None = None,
+        rounded: bool = False,
+    ) -> dict[str, list[dict]]:
+        """Return the given metrics for each group of every dimension, in a single scan."""
+        fields = _metric_fields(metrics if sort_by is None else [*metrics, sort_by])
+        keys = [zip(snapshot.column(dimension)) for dimension in dimensions]
+        return {
+            dimension: _results(groups, [dimension], fields, metrics, sort_by, descending, limit)
+            for dimension, groups in zip(dimensions, _scan(snapshot, keys, fields, rounded))
+        }
+
+
+class PandasEngine(AggregationEngine):
+    """Aggregate the inventory with pandas, which is imported on first use.
+
+    All groupings of a snapshot share its DataFrame, built once by prepare.
+    """
+
+    def prepare(self, snapshot: InventorySnapshot) -> None:
+        """Build the DataFrame of a new snapshot. Runs in the executor."""
+        snapshot.frame
+
+    def summary(self, snapshot: InventorySnapshot) -> dict:
+        """Return bottle count, total and average value of the inventory."""
+        df = snapshot.frame
+        average = df['Valuation'].mean()
+        return {
+            "total_bottles": len(df),
+            "total_value": int(df['Valuation'].sum().round(0)),
+            "average_value": int(average.round(0)) if average == average else 0,
+        }
+
+    def summarize(
+        self,
+        snapshot: InventorySnapshot,
+        group_by: list[str],
+        metrics: list[str],
+        sort_by: str | None = None,
+        descending: bool = False,
+        limit: int | None = None,
+        rounded: bool = False,
+    ) -> list[dict]:
+        """Return the given metrics for each group of bottles, in a single groupby."""
+        if not len(snapshot):
+            # An empty inventory has no columns to group by, and no groups.
+            return []
+        df = snapshot.frame
+        ranked = metrics if sort_by is None or sort_by in group_by else [*metrics, sort_by]
+        aggregations = {METRIC_COUNT: ("iWine", "count")}
+        for metric in ranked:
+            if metric not in (METRIC_COUNT, METRIC_PERCENT):
+                field, aggregate = _split_metric(metric)
+                aggregations[metric] = (field if rounded else UNROUNDED_COLUMNS[field], aggregate)
+
+        group_data = df.groupby(group_by, sort=True).agg(**aggregations)
+        if METRIC_PERCENT in ranked:
+            group_data[METRIC_PERCENT] = group_data[METRIC_COUNT] / group_data[METRIC_COUNT].sum() * 100
+
+        group_data = group_data.reset_index()
+        if sort_by is not None:
+            # A stable sort keeps ties in key order.
+            group_data = group_data.sort_values(
+                sort_by, ascending=not descending, kind="stable", na_position="last"
+            )
+        if limit is not None:
+            group_data = group_data.head(limit)
+        columns = list(group_by) + list(metrics)
+        return group_data[columns].to_dict("records")
+
+
+ENGINES = {
+    ENGINE_PYTHON: PythonEngine(),
+    ENGINE_PANDAS: PandasEngine(),
+}
@@ -0,0 +1,102 @@
+"""Inventory export for the Home Assistant Wine Cellar integration."""
+from __future__ import annotations
+
+from collections.abc import Iterator, Sequence
+from contextlib import suppress
+import csv
+import json
+import os
+import tempfile
+
+from .const import EXPORT_CSV, EXPORT_JSONL, EXPORT_PARQUET
+from .inventory import InventorySnapshot
+
+
+def _chunks(indices: Sequence[int], size: int) -> Iterator[Sequence[int]]:
+    """Return consecutive slices of at most size positions."""
+    for start in range(0, len(indices), size):
+        yield indices[start:start + size]
+
+
+def _write_csv(
+    path: str, snapshot: InventorySnapshot, indices: Sequence[int], fields: Sequence[str], chunk_size: int
+) -> None:
+    """Write the bottles as CSV, with a header row of the fields."""
+    columns = [snapshot.column(field) for field in fields]
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(fields)
+        for chunk in _chunks(indices, chunk_size):
+            writer.writerows([[column[i] for column in columns] for i in chunk])
+
+
+def _write_jsonl(
+    path: str, snapshot: InventorySnapshot, indices: Sequence[int], fields: Sequence[str], chunk_size: int
+) -> None:
+    """Write the bottles as JSON Lines, one object per bottle."""
+    columns = [snapshot.column(field) for field in fields]
+    with open(path, "w", encoding="utf-8") as file:
+        for chunk in _chunks(indices, chunk_size):
+            file.write("".join(
+                json.dumps(dict(zip(fields, (column[i] for column in columns))), ensure_ascii=False) + "\n"
+                for i in chunk
+            ))
+
+
+def _write_parquet(
+    path: str, snapshot: InventorySnapshot, indices: Sequence[int], fields: Sequence[str], chunk_size: int
+) -> None:
+    """Write the bottles as Parquet, one row group per chunk.
+
+    Values are written as the strings returned by CellarTracker, like the
+    other formats. pyarrow is only imported when a Parquet export is made.
+    """
+    import pyarrow as pa  # pylint: disable=import-outside-toplevel
+    import pyarrow.parquet as pq  # pylint: disable=import-outside-toplevel
+
+    columns = [snapshot.column(field) for field in fields]
+    schema = pa.schema([(field, pa.string()) for field in fields])
+    with pq.ParquetWriter(path, schema) as writer:
+        for chunk in _chunks(indices, chunk_size):
+            writer.write_table(pa.table(
+                {
+                    field: [None if column[i] is None else str(column[i]) for i in chunk]
+                    for field, column in zip(fields, columns)
+                },
+                schema=schema,
+            ))
+
+
+WRITERS = {
+    EXPORT_CSV: _write_csv,
+    EXPORT_JSONL: _write_jsonl,
+    EXPORT_PARQUET: _write_parquet,
+}
+
+
+def export_inventory(
+    snapshot: InventorySnapshot,
+    indices: Sequence[int],
+    fields: Sequence[str],
+    path: str,
+    export_format: str,
+    chunk_size: int,
+) -> int:
+    """Write the fields of the bottles at indices to a file and return its size in bytes.
+
+    Bottles are converted chunk_size at a time, so memory use does not grow
+    with the inventory. The file is written next to path and then moved in
+    place, so that a failed export never replaces a complete one.
+    """
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    handle, temp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+    os.close(handle)
+    try:
+        WRITERS[export_format](temp_path, snapshot, indices, fields, chunk_size)
+        os.replace(temp_path, path)
+    except BaseException:
+        with suppress(OSError):
+            os.remove(temp_path)
+        raise
+    return os.path.getsize(path)
@@ -0,0 +1,176 @@
+"""Valuation history for the Home Assistant Wine Cellar integration."""
+from __future__ import annotations
+
+from bisect import bisect_left, bisect_right
+from collections.abc import Callable
+from datetime import datetime
+import logging
+from typing import Any
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    DOMAIN,
+    HISTORY_DAY_SECONDS,
+    HISTORY_RAW_SECONDS,
+    HISTORY_SAVE_DELAY,
+    RESOLUTION_DAY,
+    RESOLUTION_MONTH,
+    STORAGE_VERSION,
+)
+from .engine import InventoryAggregates
+
+_LOGGER = logging.getLogger(__name__)
+
+# Tiers of points from the most to the least detailed.
+_RAW = "raw"
+_DAY = "day"
+_MONTH = "month"
+
+
+def _day(timestamp: int) -> tuple[int, int, int]:
+    """Return the local day of a timestamp."""
+    local = dt_util.as_local(dt_util.utc_from_timestamp(timestamp))
+    return local.year, local.month, local.day
+
+
+def _month(timestamp: int) -> tuple[int, int]:
+    """Return the local month of a timestamp."""
+    return _day(timestamp)[:2]
+
+
+def _downsample(points: list[list], bucket: Callable[[int], tuple]) -> list[list]:
+    """Keep the last point of each bucket of points in time order."""
+    kept: list[list] = []
+    for point in points:
+        if kept and bucket(kept[-1][0]) == bucket(point[0]):
+            kept[-1] = point
+        else:
+            kept.append(point)
+    return kept
+
+
+class ValuationHistory:
+    """Append-only history of the totals of an account, downsampled as it ages.
+
+    Each point holds a timestamp, the bottle count, the total value and the
+    count and value of each group of the sensor dimensions. Points are kept
+    as recorded for HISTORY_RAW_SECONDS, then one per day for
+    HISTORY_DAY_SECONDS, then one per month, so that the history stays small
+    however long it grows. It is kept in local storage rather than the recorder.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        """Initialize an empty history for a config entry."""
+        self._store = Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}.history")
+        self._tiers: dict[str, list[list]] = {_MONTH: [], _DAY: [], _RAW: []}
+        self._unsaved = False
+
+    def __len__(self) -> int:
+        """Return the number of points kept."""
+        return sum(len(points) for points in self._tiers.values())
+
+    async def async_load(self) -> None:
+        """Load the history from local storage."""
+        data = await self._store.async_load()
+        if not data:
+            return
+        try:
+            self._tiers = {tier: list(data[tier]) for tier in (_MONTH, _DAY, _RAW)}
+        except (KeyError, TypeError) as exc:
+            _LOGGER.warning(f"Ignoring unreadable valuation history: {str(exc)}")
+
+    @callback
+    def async_append(self, time: datetime, aggregates: InventoryAggregates) -> None:
+        """Record the totals of a refresh and schedule saving the history."""
+        timestamp = int(time.timestamp())
+        raw = self._tiers[_RAW]
+        if raw and raw[-1][0] > timestamp:
+            return
+        raw.append([
+            timestamp,
+            aggregates.summary["total_bottles"],
+            aggregates.summary["total_value"],
+            {
+                dimension: {group: [values["count"], values["value_total"]] for group, values in groups.items()}
+                for dimension, groups in aggregates.dimensions.items()
+            },
+        ])
+        self._compact(timestamp)
+        self._unsaved = True
+        self._store.async_delay_save(self._data_to_save, HISTORY_SAVE_DELAY)
+
+    def _data_to_save(self) -> dict[str, list[list]]:
+        """Return the tiers for a delayed save, which is then no longer pending."""
+        self._unsaved = False
+        return self._tiers
+
+    async def async_flush(self) -> None:
+        """Save the history now if a delayed save is pending, e.g. when the entry is unloaded.
+
+        Saving cancels the delayed save, which would otherwise write the history
+        again after the entry has been removed.
+        """
+        if self._unsaved:
+            self._unsaved = False
+            await self._store.async_save(self._tiers)
+
+    def _compact(self, now: int) -> None:
+        """Move the points that have aged out of a tier into the next, coarser one."""
+        for tier, coarser, age, bucket in (
+            (_RAW, _DAY, HISTORY_RAW_SECONDS, _day),
+            (_DAY, _MONTH, HISTORY_DAY_SECONDS, _month),
+        ):
+            points = self._tiers[tier]
+            aged = bisect_left([point[0] for point in points], now - age)
+            if aged:
+                self._tiers[coarser] = _downsample(self._tiers[coarser] + points[:aged], bucket)
+                del points[:aged]
+
+    def query(
+        self,
+        start: datetime | None = None,
+        end: datetime | None = None,
+        resolution: str | None = None,
+        dimensions: list[str] | None = None,
+    ) -> list[dict[str, Any]]:
+        """Return the points between start and end, inclusive, optionally one per day or month.
+
+        Only the given dimensions are included in each point.
+        """
+        first = int(start.timestamp()) if start is not None else None
+        last = int(end.timestamp()) if end is not None else None
+
+        points: list[list] = []
+        for tier in (_MONTH, _DAY, _RAW):
+            tier_points = self._tiers[tier]
+            times = [point[0] for point in tier_points]
+            low = bisect_left(times, first) if first is not None else 0
+            high = bisect_right(times, last) if last is not None else len(times)
+            points.extend(tier_points[low:high])
+
+        if resolution == RESOLUTION_DAY:
+            points = _downsample(points, _day)
+        elif resolution == RESOLUTION_MONTH:
+            points = _downsample(points, _month)
+
+        results = []
+        for timestamp, bottles, value, groups in points:
+            result = {
+                "time": dt_util.utc_from_timestamp(timestamp).isoformat(),
+                "bottles": bottles,
+                "value": value,
+            }
+            for dimension in dimensions or ():
+                result[dimension] = [
+                    {dimension: group, "count": count, "value_total": total}
+                    for group, (count, total) in groups.get(dimension, {}).items()
+                ]
+            results.append(result)
+        return results
+
+    async def async_remove(self) -> None:
+        """Remove the stored history."""
+        await self._store.async_remove()
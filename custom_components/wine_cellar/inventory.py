@@ -0,0 +1,490 @@
+"""Inventory snapshot for the Home Assistant Wine Cellar integration."""
+from __future__ import annotations
+
+from array import array
+from dataclasses import dataclass, field
+from collections.abc import Callable, Collection, Iterable, Iterator, Mapping, Sequence
+from datetime import date, datetime, timezone
+from functools import cached_property
+import hashlib
+import heapq
+import json
+from math import isnan, nan
+import sys
+from typing import TYPE_CHECKING, Any
+
+from .search import SearchIndex
+from .windows import DrinkingWindowIndex
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# CellarTracker reports purchase dates as m/d/yyyy, but accept ISO dates as well.
+PURCHASE_DATE_FORMATS = ("%m/%d/%Y", "%Y-%m-%d")
+
+# Fields of each wine indexed for search, with their weights.
+SEARCH_WINE_FIELDS = {
+    "Wine": 3.0,
+    "Producer": 3.0,
+    "Designation": 2.0,
+    "Vineyard": 2.0,
+    "Appellation": 1.0,
+    "Vintage": 1.0,
+}
+# Fields of each bottle indexed for search, as part of its wine.
+SEARCH_BOTTLE_FIELDS = {"BottleNote": 1.0}
+
+# Vintage of non-vintage wines in CellarTracker, shown as N.V.
+NON_VINTAGE = 1001
+
+# Indexes of a snapshot, built along with its columns.
+SNAPSHOT_INDEXES = ("distinct", "wines", "search_index", "drinking_windows", "barcodes", "bins")
+
+
+def _to_float(value: Any) -> float | None:
+    """Convert a CellarTracker numeric field to float, or None if empty."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_int(value: Any) -> int | None:
+    """Convert a CellarTracker year field to int, or None if empty."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        number = _to_float(value)
+        return int(number) if number is not None else None
+
+
+def _to_vintage(value: Any) -> int | None:
+    """Convert a CellarTracker vintage to int, or None if empty or non-vintage."""
+    year = _to_int(value)
+    return None if year == NON_VINTAGE else year
+
+
+def _to_date(value: Any) -> date | None:
+    """Convert a CellarTracker purchase date to a date, or None if empty."""
+    if not value:
+        return None
+    for date_format in PURCHASE_DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).date()
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+def _float_array(values: Iterable[Any], convert: Callable[[Any], float | None]) -> array:
+    """Return a typed array of converted values, NaN where a value is empty."""
+    return array("d", (nan if (number := convert(value)) is None else number for value in values))
+
+
+def _date_array(values: Iterable[Any]) -> array:
+    """Return a typed array of date ordinals, 0 where a date is empty."""
+    return array("i", (day.toordinal() if (day := _to_date(value)) else 0 for value in values))
+
+
+def inventory_hash(inventory: list[dict]) -> str:
+    """Return a hash of the inventory content, independent of key order."""
+    return hashlib.blake2b(
+        json.dumps(inventory, sort_keys=True, separators=(",", ":")).encode(),
+        digest_size=16,
+    ).hexdigest()
+
+
+def _in_range(
+    indices: Iterable[int], column: Sequence, minimum: Any, maximum: Any
+) -> Iterable[int]:
+    """Keep the indices whose typed column value lies within the given bounds."""
+    if minimum is None and maximum is None:
+        return indices
+    return [
+        i
+        for i in indices
+        if not isnan(column[i])
+        and (minimum is None or column[i] >= minimum)
+        and (maximum is None or column[i] <= maximum)
+    ]
+
+
+class EncodedColumn(Sequence):
+    """Dictionary-encoded column of raw CellarTracker values.
+
+    Each distinct value is stored once, interned if it is a string, and every
+    bottle holds the code of its value in a typed array of the smallest
+    sufficient item size.
+    """
+
+    __slots__ = ("values", "codes")
+
+    def __init__(self, raw: Iterable[Any]) -> None:
+        """Encode the values of a column."""
+        positions: dict[Any, int] = {}
+        codes = [positions.setdefault(value, len(positions)) for value in raw]
+        self.values: tuple[Any, ...] = tuple(
+            sys.intern(value) if type(value) is str else value for value in positions
+        )
+        if len(self.values) <= 0x100:
+            self.codes = array("B", codes)
+        elif len(self.values) <= 0x10000:
+            self.codes = array("H", codes)
+        else:
+            self.codes = array("I", codes)
+
+    def __len__(self) -> int:
+        """Return the number of bottles in the column."""
+        return len(self.codes)
+
+    def __getitem__(self, index):
+        """Return the value of one bottle, or a list of values for a slice."""
+        if isinstance(index, slice):
+            return [self.values[code] for code in self.codes[index]]
+        return self.values[self.codes[index]]
+
+    def __iter__(self) -> Iterator[Any]:
+        """Return the values of every bottle in order."""
+        return map(self.values.__getitem__, self.codes)
+
+
+class BottleRecord(Mapping):
+    """Read-only view of one bottle of a snapshot, decoded field by field.
+
+    Use dict(record) to materialize the bottle as returned by CellarTracker.
+    """
+
+    __slots__ = ("_snapshot", "_index")
+
+    def __init__(self, snapshot: InventorySnapshot, index: int) -> None:
+        """Initialize the view of the bottle at a position in the snapshot."""
+        self._snapshot = snapshot
+        self._index = index
+
+    def __getitem__(self, name: str) -> Any:
+        """Return the raw value of a field of the bottle."""
+        return self._snapshot.columns[name][self._index]
+
+    def __iter__(self) -> Iterator[str]:
+        """Return the field names in CellarTracker order."""
+        return iter(self._snapshot.fields)
+
+    def __len__(self) -> int:
+        """Return the number of fields."""
+        return len(self._snapshot.fields)
+
+
+class BottleRecords(Sequence):
+    """Sequence of the bottles of a snapshot as BottleRecord views."""
+
+    __slots__ = ("_snapshot",)
+
+    def __init__(self, snapshot: InventorySnapshot) -> None:
+        """Initialize the sequence of a snapshot."""
+        self._snapshot = snapshot
+
+    def __len__(self) -> int:
+        """Return the number of bottles."""
+        return len(self._snapshot)
+
+    def __getitem__(self, index):
+        """Return the view of one bottle, or a list of views for a slice."""
+        if isinstance(index, slice):
+            return [BottleRecord(self._snapshot, i) for i in range(len(self))[index]]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("bottle index out of range")
+        return BottleRecord(self._snapshot, index)
+
+
+@dataclass(frozen=True)
+class DistinctWine:
+    """Bottles of one wine (iWine) in a snapshot."""
+
+    first: int
+    quantity: int
+    indices: tuple[int, ...]
+
+
+@dataclass(frozen=True)
+class InventoryChanges:
+    """Bottles added, removed and moved between two snapshots.
+
+    added holds positions in the new snapshot, removed positions in the old
+    one, and moved pairs of (old, new) positions of bottles whose Location or
+    Bin changed. Bottles are matched on iWine and Barcode; bottles sharing
+    both, such as those without a barcode, are matched one for one, those
+    that stayed in place first.
+    """
+
+    added: list[int] = field(default_factory=list)
+    removed: list[int] = field(default_factory=list)
+    moved: list[tuple[int, int]] = field(default_factory=list)
+
+
+@dataclass(frozen=True)
+class InventorySnapshot:
+    """Immutable, columnar view of the inventory from a single coordinator refresh.
+
+    Every CellarTracker field is kept as a dictionary-encoded column, so that
+    repeated values such as Country, Producer or Location are stored once.
+    The typed columns are parsed once per refresh into arrays, with NaN for
+    empty values, and non-vintage wines, and are shared by every service and
+    attribute. Bottles are only materialized as dicts when building service
+    responses.
+    """
+
+    generation: int
+    fetched: datetime
+    content_hash: str
+    size: int
+    fields: tuple[str, ...]
+    columns: Mapping[str, EncodedColumn]
+    price: array
+    valuation: array
+    exchange_rate: array
+    vintage: array
+    begin_consume: array
+    end_consume: array
+    purchase_date: array
+
+    @classmethod
+    def from_inventory(
+        cls,
+        inventory: list[dict],
+        generation: int,
+        content_hash: str | None = None,
+        fetched: datetime | None = None,
+    ) -> InventorySnapshot:
+        """Build a snapshot from the inventory rows returned by CellarTracker."""
+        fields = tuple(inventory[0]) if inventory else ()
+        columns = {
+            name: EncodedColumn(bottle.get(name) for bottle in inventory) for name in fields
+        }
+
+        def raw(name: str) -> Iterable[Any]:
+            return columns[name] if name in columns else ()
+
+        snapshot = cls(
+            generation=generation,
+            fetched=fetched or datetime.now(timezone.utc),
+            content_hash=content_hash or inventory_hash(inventory),
+            size=len(inventory),
+            fields=fields,
+            columns=columns,
+            price=_float_array(raw("Price"), _to_float),
+            valuation=_float_array(raw("Valuation"), _to_float),
+            exchange_rate=_float_array(raw("ExchangeRate"), _to_float),
+            vintage=_float_array(raw("Vintage"), _to_vintage),
+            begin_consume=_float_array(raw("BeginConsume"), _to_int),
+            end_consume=_float_array(raw("EndConsume"), _to_int),
+            purchase_date=_date_array(raw("PurchaseDate")),
+        )
+
+        # Build the indexes here, in the executor, rather than on first use.
+        for index in SNAPSHOT_INDEXES:
+            getattr(snapshot, index)
+        return snapshot
+
+    def __len__(self) -> int:
+        """Return the number of bottles in the snapshot."""
+        return self.size
+
+    @property
+    def bottles(self) -> BottleRecords:
+        """Return read-only views of the bottles, in CellarTracker order."""
+        return BottleRecords(self)
+
+    def column(self, name: str) -> Sequence:
+        """Return the raw values of a field for every bottle."""
+        if not self.size:
+            return ()
+        return self.columns[name]
+
+    def purchase_date_at(self, index: int) -> date | None:
+        """Return the purchase date of a bottle, or None if it is empty."""
+        ordinal = self.purchase_date[index]
+        return date.fromordinal(ordinal) if ordinal else None
+
+    def top(
+        self, name: str, limit: int, descending: bool = True, indices: Iterable[int] | None = None
+    ) -> list[int]:
+        """Return the positions of up to limit bottles with the highest, or lowest, value of a typed column.
+
+        Only the best limit bottles are kept while scanning, so the inventory
+        is never sorted as a whole. Bottles with an empty value are left out,
+        and ties keep CellarTracker order.
+        """
+        column = {
+            "Valuation": self.valuation,
+            "Price": self.price,
+            "Vintage": self.vintage,
+            "BeginConsume": self.begin_consume,
+            "EndConsume": self.end_consume,
+            "PurchaseDate": self.purchase_date,
+        }[name]
+        if indices is None:
+            indices = range(self.size)
+        if name == "PurchaseDate":
+            candidates = (i for i in indices if column[i])
+        else:
+            candidates = (i for i in indices if not isnan(column[i]))
+        select = heapq.nlargest if descending else heapq.nsmallest
+        return select(limit, candidates, key=column.__getitem__)
+
+    def changes_since(self, previous: InventorySnapshot) -> InventoryChanges:
+        """Return the bottles added, removed and moved since a previous snapshot."""
+        def keyed(snapshot: InventorySnapshot) -> dict[tuple[str, str], list[int]]:
+            positions: dict[tuple[str, str], list[int]] = {}
+            for index, key in enumerate(zip(snapshot.column("iWine"), snapshot.column("Barcode"))):
+                positions.setdefault(key, []).append(index)
+            return positions
+
+        def place(snapshot: InventorySnapshot, index: int) -> tuple[str, str]:
+            return snapshot.column("Location")[index], snapshot.column("Bin")[index]
+
+        old, new = keyed(previous), keyed(self)
+        changes = InventoryChanges()
+        for key, indices in new.items():
+            old_indices = old.get(key, [])
+            if len(indices) == 1 and len(old_indices) == 1:
+                if place(previous, old_indices[0]) != place(self, indices[0]):
+                    changes.moved.append((old_indices[0], indices[0]))
+                continue
+
+            # Pair the bottles that stayed in place, then the others in order as moved.
+            stayed: dict[tuple[str, str], list[int]] = {}
+            for old_index in old_indices:
+                stayed.setdefault(place(previous, old_index), []).append(old_index)
+            paired = set()
+            unpaired = []
+            for index in indices:
+                same_place = stayed.get(place(self, index))
+                if same_place:
+                    paired.add(same_place.pop(0))
+                else:
+                    unpaired.append(index)
+            old_unpaired = [old_index for old_index in old_indices if old_index not in paired]
+            changes.moved.extend(zip(old_unpaired, unpaired))
+            changes.added.extend(unpaired[len(old_unpaired):])
+            changes.removed.extend(old_unpaired[len(unpaired):])
+        changes.removed.extend(index for key, indices in old.items() if key not in new for index in indices)
+        changes.added.sort()
+        changes.removed.sort()
+        return changes
+
+    def select(
+        self,
+        equals: Mapping[str, Collection[str]] | None = None,
+        vintage: tuple[int | None, int | None] = (None, None),
+        valuation: tuple[float | None, float | None] = (None, None),
+        consume: tuple[int | None, int | None] = (None, None),
+    ) -> Iterable[int]:
+        """Return the positions of the bottles matching all of the given filters.
+
+        equals maps a column to the values it may take. Ranges are inclusive
+        and open when a bound is None, and bottles with an empty value never
+        match a range; consume keeps bottles whose drinking window overlaps
+        the given years.
+        """
+        indices: Iterable[int] = range(self.size)
+        for name, values in (equals or {}).items():
+            column = self.columns.get(name)
+            if column is None:
+                return []
+            wanted = set(values)
+            codes = column.codes
+            wanted_codes = {code for code, value in enumerate(column.values) if value in wanted}
+            indices = [i for i in indices if codes[i] in wanted_codes]
+
+        indices = _in_range(indices, self.vintage, *vintage)
+        indices = _in_range(indices, self.valuation, *valuation)
+
+        consume_from, consume_to = consume
+        if consume_from is not None or consume_to is not None:
+            begin, end = self.begin_consume, self.end_consume
+            indices = [
+                i
+                for i in indices
+                if not (isnan(begin[i]) and isnan(end[i]))
+                and (consume_to is None or isnan(begin[i]) or begin[i] <= consume_to)
+                and (consume_from is None or isnan(end[i]) or end[i] >= consume_from)
+            ]
+
+        return indices
+
+    @cached_property
+    def distinct(self) -> dict[str, DistinctWine]:
+        """Return the bottles of each wine keyed by iWine, in order of first appearance."""
+        groups: dict[str, list[int]] = {}
+        for index, iwine in enumerate(self.column("iWine")):
+            groups.setdefault(iwine, []).append(index)
+
+        return {
+            iwine: DistinctWine(indices[0], len(indices), tuple(indices))
+            for iwine, indices in groups.items()
+        }
+
+    @cached_property
+    def wines(self) -> tuple[DistinctWine, ...]:
+        """Return the distinct wines in order of first appearance, for paging."""
+        return tuple(self.distinct.values())
+
+    @cached_property
+    def barcodes(self) -> dict[str, int]:
+        """Return the position of the bottle of each barcode, the first one if it is repeated."""
+        positions: dict[str, int] = {}
+        for index, barcode in enumerate(self.column("Barcode")):
+            positions.setdefault(barcode, index)
+        return positions
+
+    @cached_property
+    def bins(self) -> dict[tuple[str, str], tuple[int, ...]]:
+        """Return the positions of the bottles in each (Location, Bin)."""
+        groups: dict[tuple[str, str], list[int]] = {}
+        for index, place in enumerate(zip(self.column("Location"), self.column("Bin"))):
+            groups.setdefault(place, []).append(index)
+        return {place: tuple(indices) for place, indices in groups.items()}
+
+    @cached_property
+    def drinking_windows(self) -> DrinkingWindowIndex:
+        """Return the bottles indexed by their drinking window."""
+        return DrinkingWindowIndex(self.begin_consume, self.end_consume)
+
+    @cached_property
+    def search_index(self) -> SearchIndex:
+        """Return the full-text index of the wines, whose documents are positions in wines."""
+        def entries() -> Iterator[tuple[int, Any, float]]:
+            for document, wine in enumerate(self.wines):
+                for name, weight in SEARCH_WINE_FIELDS.items():
+                    if name in self.columns:
+                        yield document, self.columns[name][wine.first], weight
+                for name, weight in SEARCH_BOTTLE_FIELDS.items():
+                    if name in self.columns:
+                        column = self.columns[name]
+                        # Count a note shared by several bottles of the wine once.
+                        for value in dict.fromkeys(column[index] for index in wine.indices):
+                            yield document, value, weight
+
+        return SearchIndex(len(self.wines), entries())
+
+    @cached_property
+    def frame(self) -> pd.DataFrame:
+        """Return a DataFrame of the inventory with numeric Price and Valuation.
+
+        Price and Valuation are rounded to whole units, as presented in the
+        inventory and group summaries, and also kept unrounded in the price and
+        valuation columns. The frame is built once per snapshot and must be
+        treated as read-only. pandas is only imported when the frame is first
+        needed.
+        """
+        import pandas as pd  # pylint: disable=import-outside-toplevel
+
+        df = pd.DataFrame({name: list(self.columns[name]) for name in self.fields})
+        df["price"] = pd.Series(self.price, index=df.index, dtype="float64")
+        df["valuation"] = pd.Series(self.valuation, index=df.index, dtype="float64")
+        df["Price"] = df["price"].round(0)
+        df["Valuation"] = df["valuation"].round(0)
+        df["ExchangeRate"] = pd.Series(self.exchange_rate, index=df.index, dtype="float64")
+        return df
@@ -0,0 +1,107 @@
+"""Performance metrics for the Home Assistant Wine Cellar integration."""
+from __future__ import annotations
+
+from bisect import bisect_left
+from collections import deque
+from collections.abc import Callable
+
+from homeassistant.core import CALLBACK_TYPE, callback
+
+# Upper bounds, in seconds, of the duration histogram buckets.
+HISTOGRAM_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+
+# Number of recent durations kept to compute percentiles.
+SAMPLE_WINDOW = 256
+
+
+class OperationStats:
+    """Durations and payload sizes of one measured operation."""
+
+    def __init__(self) -> None:
+        """Initialize empty statistics."""
+        self.count = 0
+        self.last: float | None = None
+        self.peak: float | None = None
+        self.buckets = [0] * len(HISTOGRAM_BUCKETS)
+        self.samples: deque[float] = deque(maxlen=SAMPLE_WINDOW)
+        self.rows: int | None = None
+        self.size: int | None = None
+        self.peak_size: int | None = None
+
+    def add_duration(self, seconds: float) -> None:
+        """Record the duration of one run."""
+        self.count += 1
+        self.last = seconds
+        self.peak = seconds if self.peak is None else max(self.peak, seconds)
+        self.buckets[bisect_left(HISTOGRAM_BUCKETS, seconds)] += 1
+        self.samples.append(seconds)
+
+    def add_payload(self, rows: int, size: int | None = None) -> None:
+        """Record the number of rows and the serialized size of one result."""
+        self.rows = rows
+        if size is not None:
+            self.size = size
+            self.peak_size = size if self.peak_size is None else max(self.peak_size, size)
+
+    def percentile(self, percent: float) -> float | None:
+        """Return a percentile of the recent durations, or None if there are none."""
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+    def as_dict(self) -> dict:
+        """Return the statistics in a JSON serializable form."""
+        return {
+            "count": self.count,
+            "last_seconds": self.last,
+            "peak_seconds": self.peak,
+            "p50_seconds": self.percentile(50),
+            "p95_seconds": self.percentile(95),
+            "histogram": {
+                f"le_{bound}": count for bound, count in zip(HISTOGRAM_BUCKETS, self.buckets)
+            },
+            "rows": self.rows,
+            "bytes": self.size,
+            "peak_bytes": self.peak_size,
+        }
+
+
+class PerformanceMetrics:
+    """Metrics of the refreshes and services of one account."""
+
+    def __init__(self) -> None:
+        """Initialize empty metrics."""
+        self._operations: dict[str, OperationStats] = {}
+        self._listeners: list[Callable[[str], None]] = []
+
+    def get(self, name: str) -> OperationStats:
+        """Return the statistics of an operation, creating them if needed."""
+        return self._operations.setdefault(name, OperationStats())
+
+    @callback
+    def async_record(
+        self, name: str, seconds: float, rows: int | None = None, size: int | None = None
+    ) -> None:
+        """Record one run of an operation and notify the listeners."""
+        stats = self.get(name)
+        stats.add_duration(seconds)
+        if rows is not None:
+            stats.add_payload(rows, size)
+        for listener in list(self._listeners):
+            listener(name)
+
+    @callback
+    def async_add_listener(self, listener: Callable[[str], None]) -> CALLBACK_TYPE:
+        """Call listener with the operation name whenever a run is recorded."""
+        self._listeners.append(listener)
+
+        @callback
+        def remove_listener() -> None:
+            self._listeners.remove(listener)
+
+        return remove_listener
+
+    def as_dict(self) -> dict:
+        """Return all metrics in a JSON serializable form."""
+        return {name: stats.as_dict() for name, stats in sorted(self._operations.items())}
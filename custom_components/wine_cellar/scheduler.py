@@ -0,0 +1,175 @@
+"""Refresh scheduler for the Home Assistant Wine Cellar integration."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
+import random
+
+from homeassistant.core import callback
+
+
+class RefreshScheduler:
+    """Coordinate the CellarTracker downloads of all accounts.
+
+    Each account is given its own offset, so that accounts set up together
+    do not poll at the same moment, and at most max_downloads inventories
+    are downloaded at once. Failed refreshes of an account are retried after
+    an exponential backoff with jitter.
+    """
+
+    def __init__(
+        self, max_downloads: int, stagger: float, retry_min: float, retry_max: float
+    ) -> None:
+        """Initialize a scheduler without any account."""
+        self._semaphore = asyncio.Semaphore(max_downloads)
+        self._stagger = stagger
+        self._retry_min = retry_min
+        self._retry_max = retry_max
+        self._offsets: dict[str, float] = {}
+        self._failures: dict[str, int] = {}
+        self._waiting = 0
+
+    @callback
+    def async_register(self, entry_id: str) -> float:
+        """Add an account and return its offset in seconds."""
+        used = set(self._offsets.values())
+        slot = 0
+        while slot * self._stagger in used:
+            slot += 1
+        self._offsets[entry_id] = slot * self._stagger
+        self._failures[entry_id] = 0
+        return self._offsets[entry_id]
+
+    @callback
+    def async_unregister(self, entry_id: str) -> None:
+        """Remove an account, freeing its offset."""
+        self._offsets.pop(entry_id, None)
+        self._failures.pop(entry_id, None)
+
+    @asynccontextmanager
+    async def async_download(
+        self,
+    ) -> AsyncIterator[Callable[[asyncio.Future], Awaitable]]:
+        """Wait until a download may start, and hold its slot until it is done.
+
+        The block passes the executor job of the download to the function it
+        is given and awaits the result. A timeout or cancellation of the block
+        does not stop a job already running in its thread, so the slot is then
+        only freed once the job finishes.
+        """
+        self._waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+
+        jobs: list[asyncio.Future] = []
+
+        def hold(job: asyncio.Future) -> Awaitable:
+            jobs.append(job)
+            return asyncio.shield(job)
+
+        try:
+            yield hold
+        finally:
+            running = [job for job in jobs if not job.done()]
+            if running:
+                # Gathering also retrieves the outcome of jobs that fail later on.
+                asyncio.gather(*running, return_exceptions=True).add_done_callback(
+                    lambda _: self._semaphore.release()
+                )
+            else:
+                self._semaphore.release()
+
+    @callback
+    def async_succeeded(self, entry_id: str) -> None:
+        """Reset the backoff of an account after a successful refresh."""
+        self._failures[entry_id] = 0
+
+    @callback
+    def async_failed(self, entry_id: str) -> float:
+        """Record a failed refresh of an account and return the delay before the retry.
+
+        The delay doubles with each consecutive failure, from retry_min up to
+        retry_max, and is drawn uniformly from its upper half so that accounts
+        failing together do not retry together.
+        """
+        failures = self._failures.get(entry_id, 0) + 1
+        self._failures[entry_id] = failures
+        delay = min(self._retry_max, self._retry_min * 2 ** (failures - 1))
+        return random.uniform(delay / 2, delay)
+
+    def as_dict(self, entry_id: str) -> dict:
+        """Return the state of the scheduler for an account in a JSON serializable form."""
+        return {
+            "offset_seconds": self._offsets.get(entry_id),
+            "consecutive_failures": self._failures.get(entry_id),
+            "accounts": len(self._offsets),
+            "waiting_downloads": self._waiting,
+        }
+
+
+class AdaptivePolling:
+    """Polling interval and download timeout of one account, adapted to its refreshes.
+
+    The interval doubles, up to maximum, with each refresh that returns the
+    same inventory, and drops to minimum after a change or a requested
+    refresh. The timeout is a multiple of the download time expected for the
+    last row count, and doubles after a download has timed out. Until a
+    download has been measured, it is timeout_max, so that a large cellar
+    can complete its first download, such as during setup.
+    """
+
+    def __init__(
+        self,
+        interval: float,
+        minimum: float,
+        maximum: float,
+        timeout_min: float,
+        timeout_max: float,
+        timeout_factor: float,
+    ) -> None:
+        """Initialize the polling of an account, starting at interval."""
+        self._minimum = minimum
+        self._maximum = maximum
+        self._timeout_min = timeout_min
+        self._timeout_max = timeout_max
+        self._timeout_factor = timeout_factor
+        self._seconds_per_row: float | None = None
+        self.interval = min(maximum, max(minimum, interval))
+        self.timeout = timeout_max
+
+    @callback
+    def async_activity(self) -> None:
+        """Poll often again, e.g. after a refresh has been requested."""
+        self.interval = self._minimum
+
+    @callback
+    def async_refreshed(self, changed: bool) -> None:
+        """Adapt the interval to whether the last refresh changed the inventory."""
+        if changed:
+            self.interval = self._minimum
+        else:
+            self.interval = min(self._maximum, self.interval * 2)
+
+    @callback
+    def async_downloaded(self, seconds: float, rows: int) -> None:
+        """Adapt the timeout to the duration and row count of a download."""
+        seconds_per_row = seconds / max(rows, 1)
+        if self._seconds_per_row is None:
+            self._seconds_per_row = seconds_per_row
+        else:
+            # Exponentially weighted average, to smooth out a single slow download.
+            self._seconds_per_row += (seconds_per_row - self._seconds_per_row) / 4
+        expected = self._seconds_per_row * max(rows, 1)
+        self.timeout = min(self._timeout_max, max(self._timeout_min, expected * self._timeout_factor))
+
+    @callback
+    def async_timed_out(self) -> None:
+        """Allow a longer download after one has timed out."""
+        self.timeout = min(self._timeout_max, self.timeout * 2)
+
+    def as_dict(self) -> dict:
+        """Return the polling state in a JSON serializable form."""
+        return {"interval_seconds": self.interval, "timeout_seconds": self.timeout}
@@ -0,0 +1,101 @@
+"""Full-text search index for the Home Assistant Wine Cellar integration."""
+from __future__ import annotations
+
+from bisect import bisect_left
+from collections.abc import Iterable
+import heapq
+from math import log
+import re
+import unicodedata
+
+_TOKEN = re.compile(r"\w+")
+
+# Shortest query term that also matches the tokens it is a prefix of.
+MIN_PREFIX_LENGTH = 3
+
+# Weight of a prefix match relative to an exact match of the same token.
+PREFIX_WEIGHT = 0.5
+
+
+def fold(text: str) -> str:
+    """Return text without accents and in case-folded form, e.g. Sorì becomes sori."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+
+def tokenize(text: str) -> list[str]:
+    """Return the folded words of a text."""
+    return _TOKEN.findall(fold(text))
+
+
+class SearchIndex:
+    """Inverted index of tokens to the documents, such as wines, that contain them.
+
+    Each posting holds the summed weight of the fields a token appears in.
+    Queries match documents containing every term, scored by weight and
+    inverse document frequency, so they only visit the postings of their
+    terms rather than every document.
+    """
+
+    __slots__ = ("_documents", "_postings", "_vocabulary")
+
+    def __init__(self, documents: int, entries: Iterable[tuple[int, str, float]]) -> None:
+        """Build the index from (document, text, field weight) entries."""
+        self._documents = documents
+        self._postings: dict[str, dict[int, float]] = {}
+        tokens: dict[str, list[str]] = {}
+        for document, text, weight in entries:
+            if not text:
+                continue
+            words = tokens.get(text)
+            if words is None:
+                # The same texts, such as producers, repeat over many documents.
+                words = tokens[text] = tokenize(str(text))
+            for word in words:
+                posting = self._postings.setdefault(word, {})
+                posting[document] = posting.get(document, 0.0) + weight
+        self._vocabulary = sorted(self._postings)
+
+    def __len__(self) -> int:
+        """Return the number of distinct tokens."""
+        return len(self._vocabulary)
+
+    def _expand(self, term: str, prefix: bool) -> Iterable[tuple[str, float]]:
+        """Return the tokens matched by a query term, with the weight of each match."""
+        if term in self._postings:
+            yield term, 1.0
+        if not prefix or len(term) < MIN_PREFIX_LENGTH:
+            return
+        position = bisect_left(self._vocabulary, term)
+        for token in self._vocabulary[position:]:
+            if not token.startswith(term):
+                break
+            if token != term:
+                yield token, PREFIX_WEIGHT
+
+    def search(self, query: str, limit: int, prefix: bool = True) -> list[tuple[int, float]]:
+        """Return up to limit (document, score) pairs matching every term of a query, best first."""
+        scores: dict[int, float] | None = None
+        for term in dict.fromkeys(tokenize(query)):
+            matches: dict[int, float] = {}
+            for token, weight in self._expand(term, prefix):
+                posting = self._postings[token]
+                idf = log(1 + self._documents / len(posting))
+                for document, field_weight in posting.items():
+                    score = field_weight * idf * weight
+                    if score > matches.get(document, 0.0):
+                        matches[document] = score
+            if scores is None:
+                scores = matches
+            else:
+                scores = {
+                    document: score + matches[document]
+                    for document, score in scores.items()
+                    if document in matches
+                }
+            if not scores:
+                return []
+
+        if scores is None:
+            return []
+        return heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], -item[0]))
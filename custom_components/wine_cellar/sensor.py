@@ -1,41 +1,106 @@
 """The Home Assistant Wine Cellar integration."""
+from collections.abc import Sequence
+from datetime import datetime
 import enum
-import pandas as pd
+import hashlib
+from importlib.util import find_spec
 import logging
+import os
+import time
 from typing import Callable
 
 from homeassistant.core import callback
-from homeassistant.components.sensor import SensorEntity
-from homeassistant.const import CONF_USERNAME, CONF_PASSWORD
+from homeassistant.components.sensor import SensorDeviceClass, SensorEntity, SensorStateClass
+from homeassistant.const import CONF_USERNAME, CONF_PASSWORD, EntityCategory, UnitOfTime
 from homeassistant.core import HomeAssistant, ServiceCall, ServiceResponse, SupportsResponse
-from homeassistant.util import slugify
+from homeassistant.exceptions import HomeAssistantError, ServiceValidationError
+from homeassistant.util import dt as dt_util, slugify
 from homeassistant.helpers import entity_platform, service
+from homeassistant.helpers.json import json_bytes
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
 from .const import (
+    ATTR_BARCODE,
+    ATTR_BIN,
+    ATTR_CONSUME_FROM,
+    ATTR_CONSUME_TO,
+    ATTR_CURSOR,
+    ATTR_DIMENSIONS,
+    ATTR_END,
+    ATTR_EXPIRING_WITHIN,
+    ATTR_FIELDS,
+    ATTR_FILENAME,
+    ATTR_FORMAT,
+    ATTR_GROUP_BY,
+    ATTR_LIMIT,
+    ATTR_LOCATION,
+    ATTR_METRICS,
+    ATTR_PREFIX,
+    ATTR_QUERY,
+    ATTR_RESOLUTION,
+    ATTR_SORT_BY,
+    ATTR_SORT_ORDER,
+    ATTR_START,
+    ATTR_VALUATION_MAX,
+    ATTR_VALUATION_MIN,
+    ATTR_VINTAGE_MAX,
+    ATTR_VINTAGE_MIN,
+    ATTR_YEAR,
+    CONF_SERVICE_TIME_BUDGET,
+    DEFAULT_SERVICE_TIME_BUDGET,
     DOMAIN,
+    EXPORT_CHUNK_SIZE,
+    EXPORT_DIRECTORY,
+    EXPORT_PARQUET,
+    INVENTORY_FIELDS,
+    INVENTORY_FILTER_COLUMNS,
+    METRIC_DOWNLOAD,
+    METRIC_REFRESH,
+    SCHEMA_SERVICE_EXPORT_INVENTORY,
     SCHEMA_SERVICE_GET_COUNTRIES,
     SCHEMA_SERVICE_GET_INVENTORY,
     SCHEMA_SERVICE_GET_DISTINCT_INVENTORY,
+    SCHEMA_SERVICE_GET_DRINKING_WINDOW,
+    SCHEMA_SERVICE_GET_HISTORY,
     SCHEMA_SERVICE_GET_LOCATIONS,
     SCHEMA_SERVICE_GET_PRODUCERS,
+    SCHEMA_SERVICE_GET_SUMMARIES,
+    SCHEMA_SERVICE_GET_SUMMARY,
+    SCHEMA_SERVICE_GET_TOP,
     SCHEMA_SERVICE_GET_TYPES,
     SCHEMA_SERVICE_GET_VARIETALS,
     SCHEMA_SERVICE_GET_VINTAGES,
+    SCHEMA_SERVICE_LOOKUP_BOTTLE,
     SCHEMA_SERVICE_REFRESH_INVENTORY,
+    SCHEMA_SERVICE_SEARCH_INVENTORY,
+    SERVICE_EXPORT_INVENTORY,
     SERVICE_GET_COUNTRIES,
     SERVICE_GET_INVENTORY,
     SERVICE_GET_DISTINCT_INVENTORY,
+    SERVICE_GET_DRINKING_WINDOW,
+    SERVICE_GET_HISTORY,
     SERVICE_GET_LOCATIONS,
     SERVICE_GET_PRODUCERS,
+    SERVICE_GET_SUMMARIES,
+    SERVICE_GET_SUMMARY,
+    SERVICE_GET_TOP,
     SERVICE_GET_TYPES,
     SERVICE_GET_VARIETALS,
     SERVICE_GET_VINTAGES,
+    SERVICE_LOOKUP_BOTTLE,
     SERVICE_REFRESH_INVENTORY,
+    SERVICE_SEARCH_INVENTORY,
+    SORT_DESCENDING,
+    WineCellarEntityFeature,
 )
+from .export import export_inventory
+from .inventory import InventorySnapshot
 
 _LOGGER = logging.getLogger(__name__)
 
+# Cache key of the bottles selected by the get_inventory filters, shared by its pages.
+_SELECTION = "_selection"
+
 
 async def async_setup_entry(
     hass: HomeAssistant,
@@ -45,15 +110,26 @@ async def async_setup_entry(
     """Set up the Home Assistant Wine Cellar sensors."""
     entities = _create_entities(hass, entry)
     async_add_entities(entities)
+    _add_dimension_entities(hass, entry, async_add_entities)
 
     platform = entity_platform.async_get_current_platform()
 
+    # This will call Entity._export_inventory
+    platform.async_register_entity_service(
+        SERVICE_EXPORT_INVENTORY,
+        SCHEMA_SERVICE_EXPORT_INVENTORY,
+        "_export_inventory",
+        supports_response=SupportsResponse.OPTIONAL,
+        required_features=[WineCellarEntityFeature.INVENTORY],
+    )
+
     # This will call Entity._get_countries
     platform.async_register_entity_service(
         SERVICE_GET_COUNTRIES,
         SCHEMA_SERVICE_GET_COUNTRIES,
         "_get_countries",
         supports_response=SupportsResponse.ONLY,
+        required_features=[WineCellarEntityFeature.INVENTORY],
     )
 
     # This will call Entity._get_inventory
@@ -62,6 +138,7 @@ async def async_setup_entry(
         SCHEMA_SERVICE_GET_INVENTORY,
         "_get_inventory",
         supports_response=SupportsResponse.ONLY,
+        required_features=[WineCellarEntityFeature.INVENTORY],
     )
 
     # This will call Entity._get_distinct_inventory
@@ -70,6 +147,25 @@ async def async_setup_entry(
         SCHEMA_SERVICE_GET_DISTINCT_INVENTORY,
         "_get_distinct_inventory",
         supports_response=SupportsResponse.ONLY,
+        required_features=[WineCellarEntityFeature.INVENTORY],
+    )
+
+    # This will call Entity._get_drinking_window
+    platform.async_register_entity_service(
+        SERVICE_GET_DRINKING_WINDOW,
+        SCHEMA_SERVICE_GET_DRINKING_WINDOW,
+        "_get_drinking_window",
+        supports_response=SupportsResponse.ONLY,
+        required_features=[WineCellarEntityFeature.INVENTORY],
+    )
+
+    # This will call Entity._get_history
+    platform.async_register_entity_service(
+        SERVICE_GET_HISTORY,
+        SCHEMA_SERVICE_GET_HISTORY,
+        "_get_history",
+        supports_response=SupportsResponse.ONLY,
+        required_features=[WineCellarEntityFeature.INVENTORY],
     )
 
     # This will call Entity._get_locations
@@ -78,6 +174,7 @@ async def async_setup_entry(
         SCHEMA_SERVICE_GET_LOCATIONS,
         "_get_locations",
         supports_response=SupportsResponse.ONLY,
+        required_features=[WineCellarEntityFeature.INVENTORY],
     )
 
     # This will call Entity._get_producers
@@ -86,6 +183,34 @@ async def async_setup_entry(
         SCHEMA_SERVICE_GET_PRODUCERS,
         "_get_producers",
         supports_response=SupportsResponse.ONLY,
+        required_features=[WineCellarEntityFeature.INVENTORY],
+    )
+
+    # This will call Entity._get_summaries
+    platform.async_register_entity_service(
+        SERVICE_GET_SUMMARIES,
+        SCHEMA_SERVICE_GET_SUMMARIES,
+        "_get_summaries",
+        supports_response=SupportsResponse.ONLY,
+        required_features=[WineCellarEntityFeature.INVENTORY],
+    )
+
+    # This will call Entity._get_summary
+    platform.async_register_entity_service(
+        SERVICE_GET_SUMMARY,
+        SCHEMA_SERVICE_GET_SUMMARY,
+        "_get_summary",
+        supports_response=SupportsResponse.ONLY,
+        required_features=[WineCellarEntityFeature.INVENTORY],
+    )
+
+    # This will call Entity._get_top
+    platform.async_register_entity_service(
+        SERVICE_GET_TOP,
+        SCHEMA_SERVICE_GET_TOP,
+        "_get_top",
+        supports_response=SupportsResponse.ONLY,
+        required_features=[WineCellarEntityFeature.INVENTORY],
     )
 
     # This will call Entity._get_types
@@ -94,6 +219,7 @@ async def async_setup_entry(
         SCHEMA_SERVICE_GET_TYPES,
         "_get_types",
         supports_response=SupportsResponse.ONLY,
+        required_features=[WineCellarEntityFeature.INVENTORY],
     )
 
     # This will call Entity._get_varietals
@@ -102,6 +228,7 @@ async def async_setup_entry(
         SCHEMA_SERVICE_GET_VARIETALS,
         "_get_varietals",
         supports_response=SupportsResponse.ONLY,
+        required_features=[WineCellarEntityFeature.INVENTORY],
     )
 
     # This will call Entity._get_vintages
@@ -110,6 +237,16 @@ async def async_setup_entry(
         SCHEMA_SERVICE_GET_VINTAGES,
         "_get_vintages",
         supports_response=SupportsResponse.ONLY,
+        required_features=[WineCellarEntityFeature.INVENTORY],
+    )
+
+    # This will call Entity._lookup_bottle
+    platform.async_register_entity_service(
+        SERVICE_LOOKUP_BOTTLE,
+        SCHEMA_SERVICE_LOOKUP_BOTTLE,
+        "_lookup_bottle",
+        supports_response=SupportsResponse.ONLY,
+        required_features=[WineCellarEntityFeature.INVENTORY],
     )
 
     # This will call Entity._refresh_inventory
@@ -117,6 +254,16 @@ async def async_setup_entry(
         SERVICE_REFRESH_INVENTORY,
         SCHEMA_SERVICE_REFRESH_INVENTORY,
         "_refresh_inventory",
+        required_features=[WineCellarEntityFeature.INVENTORY],
+    )
+
+    # This will call Entity._search_inventory
+    platform.async_register_entity_service(
+        SERVICE_SEARCH_INVENTORY,
+        SCHEMA_SERVICE_SEARCH_INVENTORY,
+        "_search_inventory",
+        supports_response=SupportsResponse.ONLY,
+        required_features=[WineCellarEntityFeature.INVENTORY],
     )
 
 
@@ -127,18 +274,120 @@ def _create_entities(hass: HomeAssistant, entry: dict):
     coordinator = hass.data[DOMAIN][entry.entry_id]["coordinator"]
 
     entities.append(WineInventorySensor(entry, username, coordinator))
+    entities.append(WineInventorySyncSensor(entry, username, coordinator))
+    entities.append(WinePastPeakSensor(entry, username, coordinator))
+
+    for operation in (
+        METRIC_REFRESH,
+        METRIC_DOWNLOAD,
+        SERVICE_GET_INVENTORY,
+        SERVICE_GET_DISTINCT_INVENTORY,
+        SERVICE_GET_DRINKING_WINDOW,
+        SERVICE_GET_HISTORY,
+        SERVICE_GET_COUNTRIES,
+        SERVICE_GET_LOCATIONS,
+        SERVICE_GET_PRODUCERS,
+        SERVICE_GET_TYPES,
+        SERVICE_GET_VARIETALS,
+        SERVICE_GET_VINTAGES,
+        SERVICE_GET_SUMMARY,
+        SERVICE_GET_SUMMARIES,
+        SERVICE_SEARCH_INVENTORY,
+        SERVICE_LOOKUP_BOTTLE,
+        SERVICE_GET_TOP,
+        SERVICE_EXPORT_INVENTORY,
+    ):
+        entities.append(WinePerformanceSensor(entry, username, coordinator, operation))
 
     return entities
 
 
+def _add_dimension_entities(hass: HomeAssistant, entry, async_add_entities: Callable) -> None:
+    """Add a sensor for each group of the sensor dimensions, including groups that appear later."""
+    coordinator = hass.data[DOMAIN][entry.entry_id]["coordinator"]
+    if not coordinator.sensor_dimensions:
+        return
+
+    username = entry.data[CONF_USERNAME]
+    known: set[tuple[str, str]] = set()
+
+    @callback
+    def _async_add_new_groups() -> None:
+        aggregates = coordinator.aggregates
+        if aggregates is None:
+            return
+        new = [
+            (dimension, value)
+            for dimension, groups in aggregates.dimensions.items()
+            for value in groups
+            if (dimension, value) not in known
+        ]
+        if new:
+            known.update(new)
+            async_add_entities(
+                WineDimensionSensor(entry, username, coordinator, dimension, value)
+                for dimension, value in new
+            )
+
+    _async_add_new_groups()
+    entry.async_on_unload(coordinator.async_add_listener(_async_add_new_groups))
+
+
+def _encode_cursor(generation: int, position: int) -> str:
+    """Return the paging cursor of a position in the snapshot of a generation."""
+    return f"{generation}.{position}"
+
+
+def _decode_cursor(cursor: str) -> tuple[int, int]:
+    """Return the generation and position of a paging cursor."""
+    try:
+        generation, position = (int(part) for part in cursor.split("."))
+    except ValueError as err:
+        raise ServiceValidationError(f"Invalid cursor {cursor}") from err
+    if position < 0:
+        raise ServiceValidationError(f"Invalid cursor {cursor}")
+    return generation, position
+
+
+def _page(generation: int, items: Sequence, start: int, limit: int | None) -> tuple[Sequence, dict]:
+    """Return the items of a page and the paging fields of its response.
+
+    items must be a list, tuple or range so that the page is sliced in
+    proportion to its size.
+    """
+    end = len(items) if limit is None else min(len(items), start + limit)
+    paging = {
+        "total": len(items),
+        "next_cursor": _encode_cursor(generation, end) if end < len(items) else None,
+    }
+    return items[start:end], paging
+
+
+def _count_rows(response: dict) -> int:
+    """Return the number of rows in the lists of a service response."""
+    rows = 0
+    for value in response.values():
+        if isinstance(value, list):
+            rows += len(value)
+        elif isinstance(value, dict):
+            rows += _count_rows(value)
+    return rows
+
+
 class WineInventorySensor(CoordinatorEntity, SensorEntity):
     """Represent a sensor for the inventory."""
 
+    # Only this sensor answers the inventory services of the platform.
+    _attr_supported_features = WineCellarEntityFeature.INVENTORY
+    # The summary is kept in the valuation history instead of the recorder.
+    _unrecorded_attributes = frozenset({"summary"})
+
     def __init__(self, entry, username, coordinator):
         """Set up a new HA Cellar Tracker inventory sensor."""
         self._entry = entry
         self._username = username
         self._entity_type = "sensor"
+        self._written = None
         super().__init__(coordinator)
 
     @property
@@ -161,136 +410,130 @@ class WineInventorySensor(CoordinatorEntity, SensorEntity):
         """The unit of measurement that the sensor's value is expressed in."""
         return "bottles"
 
+    @property
+    def available(self) -> bool:
+        """Return True while there is inventory data, even if it is stale."""
+        return self.coordinator.data is not None
+
+    @property
+    def native_value(self) -> int | None:
+        """Return the number of bottles in the inventory."""
+        if self.coordinator.data is None:
+            return None
+        return len(self.coordinator.data)
+
     @property
     def extra_state_attributes(self):
         attributes = { "summary": "None" }
         if self.coordinator.data is not None:
-            attributes["summary"] = self._inventory_summary()
+            attributes["summary"] = self._inventory_summary(self._snapshot)
         return attributes
 
+    @property
+    def _snapshot(self) -> InventorySnapshot:
+        """Return the inventory snapshot from the latest coordinator refresh."""
+        return self.coordinator.data
+
     @callback
     def _handle_coordinator_update(self):
-        """Handle updated data from the coordinator."""
-        self._attr_native_value = len(self.coordinator.data)
+        """Handle updated data from the coordinator.
+
+        The state is only written when the inventory content or the
+        availability of the sensor has changed.
+        """
+        if self.coordinator.data is None:
+            return super()._handle_coordinator_update()
+
+        written = (self._snapshot.content_hash, self.available)
+        if written == self._written:
+            return
+        self._written = written
         return super()._handle_coordinator_update()
 
-    def _inventory_summary(self) -> list[dict]:
-        """Build a list of dict objects for summary of inventory."""
-        summary = []
-        data = {}
-        df = pd.DataFrame(self.coordinator.data)
-        df[["Price","Valuation"]] = df[["Price","Valuation"]].apply(pd.to_numeric).round(0)
-        
-        data["total_bottles"] = len(df)
-        data["total_value"] = int(df['Valuation'].sum().round(0))
-        data["average_value"] = int(df['Valuation'].mean().round(0))
-
-        summary.append(data)
-        return summary
+    def _inventory_summary(self, snapshot: InventorySnapshot) -> list[dict]:
+        """Build a list of dict objects for summary of inventory.
+
+        The summary is computed once per refresh, along with the dimension sensors.
+        """
+        aggregates = self.coordinator.aggregates
+        if aggregates is not None and aggregates.generation == snapshot.generation:
+            return [aggregates.summary]
+        return [self.coordinator.engine.summary(snapshot)]
+
+    def _inventory_list(self, snapshot: InventorySnapshot, indices=None, fields=INVENTORY_FIELDS) -> list[dict]:
+        """Build a list of dict objects for each selected bottle in inventory."""
+        columns = [snapshot.column(field) for field in fields]
+        if indices is None:
+            rows = zip(*columns)
+        else:
+            rows = ([column[i] for column in columns] for i in indices)
+        return [dict(zip(fields, row)) for row in rows]
+
+    def _inventory_group_summary(self, snapshot: InventorySnapshot, group, options: dict | None = None) -> list[dict]:
+        """Build a list of dict objects for summary of inventory by various groups.
+
+        The groups may be ordered by one of their fields and limited in number.
+        """
+        options = options or {}
+        return self.coordinator.engine.group_summary(
+            snapshot,
+            group,
+            options.get(ATTR_SORT_BY),
+            options.get(ATTR_SORT_ORDER) == SORT_DESCENDING,
+            options.get(ATTR_LIMIT),
+        )
+
+    def _inventory_top(self, snapshot: InventorySnapshot, options: dict) -> list[dict]:
+        """Build a list of dict objects for the selected bottles ranking first by a typed column."""
+        filters = {
+            key: value
+            for key, value in options.items()
+            if key not in (ATTR_FIELDS, ATTR_LIMIT, ATTR_SORT_BY, ATTR_SORT_ORDER)
+        }
+        indices = snapshot.top(
+            options[ATTR_SORT_BY],
+            options[ATTR_LIMIT],
+            options[ATTR_SORT_ORDER] == SORT_DESCENDING,
+            self._select(snapshot, filters),
+        )
+        return self._inventory_list(snapshot, indices, options.get(ATTR_FIELDS) or INVENTORY_FIELDS)
+
+    def _inventory_multi_summary(
+        self,
+        snapshot: InventorySnapshot,
+        group_by: list[str],
+        metrics: list[str],
+        sort_by: str | None = None,
+        descending: bool = False,
+        limit: int | None = None,
+    ) -> list[dict]:
+        """Build a list of dict objects for summary of inventory by several columns."""
+        summary = self.coordinator.engine.summarize(snapshot, group_by, metrics, sort_by, descending, limit)
+        return self._format_summary(summary, metrics)
 
-    def _inventory_list(self) -> list[dict]:
-        """Build a list of dict objects for each bottle in inventory."""
-        inventory = []
-        for bottle in self.coordinator.data:
-            wine = {}
-            wine["iWine"] = bottle["iWine"]
-            wine["Barcode"] = bottle["Barcode"]
-            wine["Location"] = bottle["Location"]
-            wine["Bin"] = bottle["Bin"]
-            wine["Size"] = bottle["Size"]
-            wine["Currency"] = bottle["Currency"]
-            wine["ExchangeRate"] = bottle["ExchangeRate"]
-            wine["Valuation"] = bottle["Valuation"]
-            wine["Price"] = bottle["Price"]
-            wine["NativePrice"] = bottle["NativePrice"]
-            wine["NativePriceCurrency"] = bottle["NativePriceCurrency"]
-            wine["StoreName"] = bottle["StoreName"]
-            wine["PurchaseDate"] = bottle["PurchaseDate"]
-            wine["BottleNote"] = bottle["BottleNote"]
-            wine["Vintage"] = bottle["Vintage"]
-            wine["Wine"] = bottle["Wine"]
-            wine["Locale"] = bottle["Locale"]
-            wine["Country"] = bottle["Country"]
-            wine["Region"] = bottle["Region"]
-            wine["SubRegion"] = bottle["SubRegion"]
-            wine["Appellation"] = bottle["Appellation"]
-            wine["Producer"] = bottle["Producer"]
-            wine["SortProducer"] = bottle["SortProducer"]
-            wine["Type"] = bottle["Type"]
-            wine["Color"] = bottle["Color"]
-            wine["Category"] = bottle["Category"]
-            wine["Varietal"] = bottle["Varietal"]
-            wine["MasterVarietal"] = bottle["MasterVarietal"]
-            wine["Designation"] = bottle["Designation"]
-            wine["Vineyard"] = bottle["Vineyard"]
-            wine["WA"] = bottle["WA"]
-            wine["WS"] = bottle["WS"]
-            wine["IWC"] = bottle["IWC"]
-            wine["BH"] = bottle["BH"]
-            wine["AG"] = bottle["AG"]
-            wine["WE"] = bottle["WE"]
-            wine["JR"] = bottle["JR"]
-            wine["RH"] = bottle["RH"]
-            wine["JG"] = bottle["JG"]
-            wine["GV"] = bottle["GV"]
-            wine["JK"] = bottle["JK"]
-            wine["LD"] = bottle["LD"]
-            wine["CW"] = bottle["CW"]
-            wine["WFW"] = bottle["WFW"]
-            wine["PR"] = bottle["PR"]
-            wine["SJ"] = bottle["SJ"]
-            wine["WD"] = bottle["WD"]
-            wine["RR"] = bottle["RR"]
-            wine["JH"] = bottle["JH"]
-            wine["MFW"] = bottle["MFW"]
-            wine["WWR"] = bottle["WWR"]
-            wine["IWR"] = bottle["IWR"]
-            wine["CHG"] = bottle["CHG"]
-            wine["TT"] = bottle["TT"]
-            wine["TWF"] = bottle["TWF"]
-            wine["DR"] = bottle["DR"]
-            wine["FP"] = bottle["FP"]
-            wine["JM"] = bottle["JM"]
-            wine["PG"] = bottle["PG"]
-            wine["WAL"] = bottle["WAL"]
-            wine["JS"] = bottle["JS"]
-            wine["CT"] = bottle["CT"]
-            wine["CNotes"] = bottle["CNotes"]
-            wine["MY"] = bottle["MY"]
-            wine["PNotes"] = bottle["PNotes"]
-            wine["BeginConsume"] = bottle["BeginConsume"]
-            wine["EndConsume"] = bottle["EndConsume"]
-            wine["PurchasedCommunity"] = bottle["PurchasedCommunity"]
-            wine["QuantityCommunity"] = bottle["QuantityCommunity"]
-            wine["PendingCommunity"] = bottle["PendingCommunity"]
-            wine["ConsumedCommunity"] = bottle["ConsumedCommunity"]
-            inventory.append(wine)
-        return inventory
-
-    def _inventory_group_summary(self, group) -> list[dict]:
-        """Build a list of dict objects for summary of inventory by various groups."""
-        summary = []
-        df = pd.DataFrame(self.coordinator.data)
-        df[["Price","Valuation"]] = df[["Price","Valuation"]].apply(pd.to_numeric).round(0)
-        
-        group_data = df.groupby(group).agg({'iWine':'count','Valuation':['sum','mean']})
-        group_data.columns = group_data.columns.droplevel(0)
-        group_data["mean"] = group_data["mean"].round(0)
-        group_data["percent"] = 1
-        group_data["percent"] = ((group_data['count']/group_data['count'].sum() ) * 100).round(0)
-        group_data.columns = ["count", "value_total", "value_avg", "percent"]
-        data = {}
-        for row, item in group_data.iterrows():
-          data[row] = item.to_dict()
-
-        keysList = list(data.keys())
-        valuesList = list(data.values())
-        for index, element in enumerate(keysList):
-            the_dict = {group: element}
-            for key in valuesList[index]:
-                the_dict[key] = valuesList[index][key]
-            summary.append(the_dict)
+    def _inventory_summaries(
+        self,
+        snapshot: InventorySnapshot,
+        dimensions: list[str],
+        metrics: list[str],
+        sort_by: str | None = None,
+        descending: bool = False,
+        limit: int | None = None,
+    ) -> dict[str, list[dict]]:
+        """Build lists of dict objects for summaries of inventory by each dimension."""
+        summaries = self.coordinator.engine.summarize_many(snapshot, dimensions, metrics, sort_by, descending, limit)
+        return {
+            dimension: self._format_summary(summary, metrics)
+            for dimension, summary in summaries.items()
+        }
 
+    def _format_summary(self, summary: list[dict], metrics: list[str]) -> list[dict]:
+        """Round the metrics of the groups of a summary, already sorted and limited by the engine."""
+        for row in summary:
+            for metric in metrics:
+                value = row[metric]
+                if isinstance(value, float):
+                    row[metric] = round(value, 2) if value == value else None
         return summary
 
     def _get_distinct_values(self, bottle: dict) -> dict:
@@ -323,71 +566,604 @@ class WineInventorySensor(CoordinatorEntity, SensorEntity):
         wine["ConsumedCommunity"] = bottle["ConsumedCommunity"]
         return wine
 
-    def _inventory_group_distinct(self) -> list[dict]:
+    def _inventory_group_distinct(self, snapshot: InventorySnapshot, wines=None) -> list[dict]:
         """Build a list of dict objects for summary of inventory by distinct wines."""
-        idList = []
         wineList = []
-        groupby = "iWine"
-
-        # Get list of wine IDs.
-        for item in self.coordinator.data:
-            idList.append(item[groupby])
-
-        # Count duplicates (multiple bottles of a wine)
-        counts = dict()
-        for i in idList:
-            counts[i] = counts.get(i, 0) + 1
+        bottles = snapshot.bottles
+        if wines is None:
+            wines = snapshot.wines
 
         # Get values identical over all bottles of a wine and add bottle count value
-        for key, value in counts.items():
-            element = find_first_matching_element(self.coordinator.data, groupby, key)
-            distinct_values = self._get_distinct_values(element)
-            distinct_values['Quantity'] = value
+        for wine in wines:
+            distinct_values = self._get_distinct_values(bottles[wine.first])
+            distinct_values['Quantity'] = wine.quantity
             wineList.append(distinct_values)
 
         return wineList
 
-    async def _get_countries(self):
-        return { "countries": self._inventory_group_summary("Country") }
+    def _inventory_search(self, snapshot: InventorySnapshot, query: str, limit: int, prefix: bool) -> list[dict]:
+        """Build a list of dict objects for the distinct wines best matching a search query."""
+        wines = snapshot.wines
+        results = []
+        for document, score in snapshot.search_index.search(query, limit, prefix):
+            wine = wines[document]
+            result = self._get_distinct_values(snapshot.bottles[wine.first])
+            result["Quantity"] = wine.quantity
+            result["score"] = round(score, 3)
+            results.append(result)
+        return results
+
+    def _inventory_drinking_window(
+        self, snapshot: InventorySnapshot, year: int, expiring_within: int | None, fields
+    ) -> dict:
+        """Build the bottles ready in a year, those expiring soon and the count of ready bottles per year."""
+        windows = snapshot.drinking_windows
+        response = {
+            "year": year,
+            "ready": self._inventory_list(snapshot, windows.ready(year), fields),
+            "past_peak": windows.count_past_peak(year),
+            "per_year": [
+                {"year": window_year, "count": count}
+                for window_year, count in windows.counts_per_year().items()
+            ],
+        }
+        if expiring_within is not None:
+            response["expiring"] = self._inventory_list(
+                snapshot, windows.expiring(year, expiring_within), fields
+            )
+        return response
+
+    def _paging_start(self, kwargs: dict) -> tuple[InventorySnapshot, int]:
+        """Return the snapshot and start position of a page, from its cursor if there is one.
+
+        A cursor keeps paging through the snapshot it was issued for, even after
+        a refresh, for as long as the coordinator keeps that snapshot.
+        """
+        cursor = kwargs.get(ATTR_CURSOR)
+        if cursor is None:
+            return self._snapshot, 0
+
+        generation, position = _decode_cursor(cursor)
+        snapshot = self.coordinator.get_snapshot(generation)
+        if snapshot is None:
+            raise ServiceValidationError(
+                "The cursor has expired because the inventory has been refreshed since, "
+                "start again without a cursor"
+            )
+        return snapshot, position
+
+    def _select(self, snapshot: InventorySnapshot, filters: dict) -> Sequence[int]:
+        """Return the positions of the bottles matching the get_inventory filters."""
+        return snapshot.select(
+            equals={
+                column: filters[attr]
+                for attr, column in INVENTORY_FILTER_COLUMNS.items()
+                if attr in filters
+            },
+            vintage=(filters.get(ATTR_VINTAGE_MIN), filters.get(ATTR_VINTAGE_MAX)),
+            valuation=(filters.get(ATTR_VALUATION_MIN), filters.get(ATTR_VALUATION_MAX)),
+            consume=(filters.get(ATTR_CONSUME_FROM), filters.get(ATTR_CONSUME_TO)),
+        )
+
+    async def _async_selection(self, snapshot: InventorySnapshot, filters: dict) -> Sequence[int]:
+        """Return the selected bottles, computed once per snapshot and filters for all pages."""
+        if not filters:
+            return range(len(snapshot))
+
+        async def _compute() -> Sequence[int]:
+            return await self.hass.async_add_executor_job(self._select, snapshot, filters)
+
+        return await self.coordinator.cache.async_get(
+            _SELECTION, filters, snapshot.generation, _compute
+        )
+
+    async def _async_cached_response(
+        self,
+        service_name: str,
+        params: dict,
+        compute: Callable[[InventorySnapshot], dict],
+        snapshot: InventorySnapshot | None = None,
+    ) -> dict:
+        """Return a service response, reusing it while the inventory is unchanged.
+
+        The response is computed in the executor so the event loop is not blocked.
+        Its row count and serialized size are recorded in the coordinator metrics.
+        The latest snapshot is used unless another one is given.
+        """
+        if snapshot is None:
+            snapshot = self._snapshot
+        metrics = self.coordinator.metrics
+
+        def _compute_with_size() -> tuple[dict, int, int]:
+            response = compute(snapshot)
+            rows = _count_rows(response)
+            return response, rows, len(json_bytes(response))
+
+        async def _compute() -> dict:
+            start = time.monotonic()
+            response, rows, size = await self.hass.async_add_executor_job(_compute_with_size)
+            elapsed = time.monotonic() - start
+            metrics.get(service_name).add_payload(rows, size)
+            budget = self._entry.options.get(CONF_SERVICE_TIME_BUDGET, DEFAULT_SERVICE_TIME_BUDGET)
+            if elapsed > budget:
+                _LOGGER.warning(
+                    f"{service_name} for {self._username} took {elapsed:.3f} s, "
+                    f"exceeding the budget of {budget} s"
+                )
+            return response
+
+        start = time.monotonic()
+        response = await self.coordinator.cache.async_get(
+            service_name, params, snapshot.generation, _compute
+        )
+        metrics.async_record(service_name, time.monotonic() - start)
+        return response
 
-    async def _get_inventory(self):
-        return { "inventory": self._inventory_list() }
+    async def _export_inventory(self, **kwargs):
+        export_format = kwargs[ATTR_FORMAT]
+        if export_format == EXPORT_PARQUET and find_spec("pyarrow") is None:
+            raise ServiceValidationError("Exporting to Parquet requires pyarrow, which is not installed")
+        filename = kwargs.get(ATTR_FILENAME) or f"{slugify(self._username)}_inventory.{export_format}"
+        if os.path.basename(filename) != filename or filename.startswith("."):
+            raise ServiceValidationError(f"{filename} is not a valid file name")
 
-    async def _get_distinct_inventory(self):
-        return { "inventory": self._inventory_group_distinct() }
+        path = self.hass.config.path(EXPORT_DIRECTORY, filename)
+        fields = kwargs.get(ATTR_FIELDS) or INVENTORY_FIELDS
+        filters = {
+            key: value for key, value in kwargs.items() if key not in (ATTR_FIELDS, ATTR_FILENAME, ATTR_FORMAT)
+        }
+        snapshot = self._snapshot
 
-    async def _get_locations(self):
-        return { "locations": self._inventory_group_summary("Location") }
+        # The export writes a file, so it is never cached, and it runs in the
+        # executor from selection to the last chunk.
+        def _export() -> tuple[int, int]:
+            indices = self._select(snapshot, filters)
+            return len(indices), export_inventory(
+                snapshot, indices, fields, path, export_format, EXPORT_CHUNK_SIZE
+            )
 
-    async def _get_producers(self):
-        return { "producers": self._inventory_group_summary("Producer") }
+        start = time.monotonic()
+        try:
+            rows, size = await self.hass.async_add_executor_job(_export)
+        except OSError as exc:
+            raise HomeAssistantError(f"Could not export the inventory to {path}: {str(exc)}") from exc
+        self.coordinator.metrics.async_record(SERVICE_EXPORT_INVENTORY, time.monotonic() - start, rows, size)
+        return { "path": path, "format": export_format, "rows": rows, "size": size }
 
-    async def _get_types(self):
-        return { "types": self._inventory_group_summary("Type") }
+    async def _get_countries(self, **kwargs):
+        return await self._async_cached_response(
+            SERVICE_GET_COUNTRIES, kwargs,
+            lambda snapshot: { "countries": self._inventory_group_summary(snapshot, "Country", kwargs) },
+        )
 
-    async def _get_varietals(self):
-        return { "varietals": self._inventory_group_summary("Varietal") }
+    async def _get_inventory(self, **kwargs):
+        fields = kwargs.get(ATTR_FIELDS) or INVENTORY_FIELDS
+        if ATTR_LIMIT not in kwargs and ATTR_CURSOR not in kwargs:
+            return await self._async_cached_response(
+                SERVICE_GET_INVENTORY, kwargs,
+                lambda snapshot: {
+                    "inventory": self._inventory_list(snapshot, self._select(snapshot, kwargs), fields)
+                },
+            )
 
-    async def _get_vintages(self):
-        return { "vintages": self._inventory_group_summary("Vintage") }
+        # Pages are served in CellarTracker order from the selection of their snapshot.
+        snapshot, start = self._paging_start(kwargs)
+        filters = {
+            key: value for key, value in kwargs.items() if key not in (ATTR_FIELDS, ATTR_LIMIT, ATTR_CURSOR)
+        }
+        indices = await self._async_selection(snapshot, filters)
+
+        def compute(snapshot: InventorySnapshot) -> dict:
+            page, paging = _page(snapshot.generation, indices, start, kwargs.get(ATTR_LIMIT))
+            return { "inventory": self._inventory_list(snapshot, page, fields), **paging }
+
+        return await self._async_cached_response(SERVICE_GET_INVENTORY, kwargs, compute, snapshot)
+
+    async def _get_distinct_inventory(self, **kwargs):
+        if ATTR_LIMIT not in kwargs and ATTR_CURSOR not in kwargs:
+            return await self._async_cached_response(
+                SERVICE_GET_DISTINCT_INVENTORY, {},
+                lambda snapshot: { "inventory": self._inventory_group_distinct(snapshot) },
+            )
+
+        snapshot, start = self._paging_start(kwargs)
+
+        def compute(snapshot: InventorySnapshot) -> dict:
+            page, paging = _page(snapshot.generation, snapshot.wines, start, kwargs.get(ATTR_LIMIT))
+            return { "inventory": self._inventory_group_distinct(snapshot, page), **paging }
+
+        return await self._async_cached_response(SERVICE_GET_DISTINCT_INVENTORY, kwargs, compute, snapshot)
+
+    async def _get_drinking_window(self, **kwargs):
+        # Resolve the default year here so that cached responses are per year.
+        params = {ATTR_YEAR: dt_util.now().year, **kwargs}
+        return await self._async_cached_response(
+            SERVICE_GET_DRINKING_WINDOW, params,
+            lambda snapshot: self._inventory_drinking_window(
+                snapshot,
+                params[ATTR_YEAR],
+                params.get(ATTR_EXPIRING_WITHIN),
+                params.get(ATTR_FIELDS) or INVENTORY_FIELDS,
+            ),
+        )
+
+    async def _get_history(self, **kwargs):
+        # The history grows with every refresh, even when the inventory is
+        # unchanged, so its responses are not cached. The query is a small bisect.
+        dimensions = kwargs.get(ATTR_DIMENSIONS, [])
+        unrecorded = [dimension for dimension in dimensions if dimension not in self.coordinator.sensor_dimensions]
+        if unrecorded:
+            raise ServiceValidationError(
+                f"Cannot return {', '.join(unrecorded)}, the history only records "
+                "the dimensions chosen for sensors in the options"
+            )
+
+        start = time.monotonic()
+        history = self.coordinator.history.query(
+            dt_util.as_utc(kwargs[ATTR_START]) if ATTR_START in kwargs else None,
+            dt_util.as_utc(kwargs[ATTR_END]) if ATTR_END in kwargs else None,
+            kwargs.get(ATTR_RESOLUTION),
+            dimensions,
+        )
+        self.coordinator.metrics.async_record(SERVICE_GET_HISTORY, time.monotonic() - start, len(history))
+        return { "history": history }
+
+    async def _get_locations(self, **kwargs):
+        return await self._async_cached_response(
+            SERVICE_GET_LOCATIONS, kwargs,
+            lambda snapshot: { "locations": self._inventory_group_summary(snapshot, "Location", kwargs) },
+        )
+
+    async def _get_producers(self, **kwargs):
+        return await self._async_cached_response(
+            SERVICE_GET_PRODUCERS, kwargs,
+            lambda snapshot: { "producers": self._inventory_group_summary(snapshot, "Producer", kwargs) },
+        )
+
+    async def _get_summaries(self, **kwargs):
+        metrics = kwargs[ATTR_METRICS]
+        sort_by = kwargs.get(ATTR_SORT_BY)
+        if sort_by is not None and sort_by not in metrics:
+            raise ServiceValidationError(
+                f"Cannot sort by {sort_by}, which is not one of the metrics"
+            )
+
+        return await self._async_cached_response(
+            SERVICE_GET_SUMMARIES, kwargs,
+            lambda snapshot: { "summaries": self._inventory_summaries(
+                snapshot,
+                kwargs[ATTR_DIMENSIONS],
+                metrics,
+                sort_by,
+                kwargs[ATTR_SORT_ORDER] == SORT_DESCENDING,
+                kwargs.get(ATTR_LIMIT),
+            ) },
+        )
+
+    async def _get_summary(self, **kwargs):
+        group_by = kwargs[ATTR_GROUP_BY]
+        metrics = kwargs[ATTR_METRICS]
+        sort_by = kwargs.get(ATTR_SORT_BY)
+        if sort_by is not None and sort_by not in group_by and sort_by not in metrics:
+            raise ServiceValidationError(
+                f"Cannot sort by {sort_by}, which is not one of the group_by columns or metrics"
+            )
+
+        return await self._async_cached_response(
+            SERVICE_GET_SUMMARY, kwargs,
+            lambda snapshot: { "summary": self._inventory_multi_summary(
+                snapshot,
+                group_by,
+                metrics,
+                sort_by,
+                kwargs[ATTR_SORT_ORDER] == SORT_DESCENDING,
+                kwargs.get(ATTR_LIMIT),
+            ) },
+        )
+
+    async def _get_top(self, **kwargs):
+        return await self._async_cached_response(
+            SERVICE_GET_TOP, kwargs,
+            lambda snapshot: { "top": self._inventory_top(snapshot, kwargs) },
+        )
+
+    async def _get_types(self, **kwargs):
+        return await self._async_cached_response(
+            SERVICE_GET_TYPES, kwargs,
+            lambda snapshot: { "types": self._inventory_group_summary(snapshot, "Type", kwargs) },
+        )
+
+    async def _get_varietals(self, **kwargs):
+        return await self._async_cached_response(
+            SERVICE_GET_VARIETALS, kwargs,
+            lambda snapshot: { "varietals": self._inventory_group_summary(snapshot, "Varietal", kwargs) },
+        )
+
+    async def _get_vintages(self, **kwargs):
+        return await self._async_cached_response(
+            SERVICE_GET_VINTAGES, kwargs,
+            lambda snapshot: { "vintages": self._inventory_group_summary(snapshot, "Vintage", kwargs) },
+        )
+
+    async def _search_inventory(self, **kwargs):
+        return await self._async_cached_response(
+            SERVICE_SEARCH_INVENTORY, kwargs,
+            lambda snapshot: { "results": self._inventory_search(
+                snapshot, kwargs[ATTR_QUERY], kwargs[ATTR_LIMIT], kwargs[ATTR_PREFIX]
+            ) },
+        )
+
+    async def _lookup_bottle(self, **kwargs):
+        barcode = kwargs.get(ATTR_BARCODE)
+        location, bin = kwargs.get(ATTR_LOCATION), kwargs.get(ATTR_BIN)
+        if barcode is None and (location is None or bin is None):
+            raise ServiceValidationError("Either a barcode, or a location and a bin, are required")
+
+        # The lookup is a hash lookup in indexes built once per refresh, so it
+        # is answered right away rather than in the executor or the cache.
+        start = time.monotonic()
+        snapshot = self._snapshot
+        if barcode is not None:
+            index = snapshot.barcodes.get(barcode)
+            indices = [] if index is None else [index]
+            if location is not None:
+                indices = [i for i in indices if snapshot.column("Location")[i] == location]
+            if bin is not None:
+                indices = [i for i in indices if snapshot.column("Bin")[i] == bin]
+        else:
+            indices = snapshot.bins.get((location, bin), ())
+
+        bottles = self._inventory_list(snapshot, indices, kwargs.get(ATTR_FIELDS) or INVENTORY_FIELDS)
+        self.coordinator.metrics.async_record(SERVICE_LOOKUP_BOTTLE, time.monotonic() - start, len(bottles))
+        return { "bottles": bottles }
 
     async def _refresh_inventory(self):
+        # Poll more often for a while, as the inventory is likely being edited
+        self.coordinator.polling.async_activity()
        # Update the data
         await self.coordinator.async_request_refresh()
 
-def find_first_matching_element(list_of_dicts, key, value):
-    """
-    Finds the first dictionary in a list where a specified key has a certain value.
 
-    Args:
-        list_of_dicts: A list of dictionaries.
-        key: The key to search for within each dictionary.
-        value: The value that the key should match.
+class WineInventorySyncSensor(CoordinatorEntity, SensorEntity):
+    """Represent a sensor for the time the inventory was last synced."""
 
-    Returns:
-        The first dictionary that matches the criteria, or None if no match is found.
-    """
-    for dictionary in list_of_dicts:
-        if key in dictionary and dictionary[key] == value:
-            return dictionary
-    return None
+    _attr_device_class = SensorDeviceClass.TIMESTAMP
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+
+    def __init__(self, entry, username, coordinator):
+        """Set up a new HA Cellar Tracker last synced sensor."""
+        self._entry = entry
+        self._username = username
+        self._entity_type = "sensor"
+        super().__init__(coordinator)
+
+    @property
+    def icon(self) -> str:
+        """Return icon."""
+        return "mdi:cloud-sync"
+
+    @property
+    def name(self) -> str:
+        """Return the name of this sensor including the user's name."""
+        return f"{self._username} Wine Inventory Last Synced"
+
+    @property
+    def unique_id(self) -> str:
+        """Return a unique, Home Assistant friendly identifier for this entity."""
+        return slugify(f"{self._entity_type}_{self._username}_wine_inventory_last_synced")
+
+    @property
+    def available(self) -> bool:
+        """Return True once the inventory has been synced or loaded from the cache."""
+        return self.coordinator.last_synced is not None
+
+    @property
+    def native_value(self) -> datetime | None:
+        """Return the time of the last successful download from CellarTracker."""
+        return self.coordinator.last_synced
+
+
+class WineDimensionSensor(CoordinatorEntity, SensorEntity):
+    """Represent a sensor for the bottles of one group of a dimension, such as a location."""
+
+    _attr_state_class = SensorStateClass.MEASUREMENT
+
+    def __init__(self, entry, username, coordinator, dimension, value):
+        """Set up a new HA Cellar Tracker dimension sensor."""
+        self._entry = entry
+        self._username = username
+        self._entity_type = "sensor"
+        self._dimension = dimension
+        self._value = value
+        self._written = None
+        super().__init__(coordinator)
+
+    @property
+    def icon(self) -> str:
+        """Return icon."""
+        return "mdi:bottle-wine-outline"
+
+    @property
+    def name(self) -> str:
+        """Return the name of this sensor including the user's name."""
+        return f"{self._username} Wine {self._dimension} {self._value}"
+
+    @property
+    def unique_id(self) -> str:
+        """Return a unique, Home Assistant friendly identifier for this entity.
+
+        Values that only differ in case or accents, such as Côte and Cote, have
+        the same slug, so a hash of the raw value keeps their identifiers apart.
+        """
+        slug = slugify(f"{self._entity_type}_{self._username}_wine_{self._dimension}_{self._value}")
+        return f"{slug}_{hashlib.blake2b(self._value.encode(), digest_size=4).hexdigest()}"
+
+    @property
+    def native_unit_of_measurement(self) -> str:
+        """The unit of measurement that the sensor's value is expressed in."""
+        return "bottles"
+
+    @property
+    def _group(self) -> dict | None:
+        """Return the aggregated values of the group, or None if it has no bottles left."""
+        aggregates = self.coordinator.aggregates
+        if aggregates is None:
+            return None
+        return aggregates.dimensions.get(self._dimension, {}).get(self._value)
+
+    @property
+    def available(self) -> bool:
+        """Return True while the group has bottles in the inventory."""
+        return self._group is not None
+
+    @property
+    def native_value(self) -> int | None:
+        """Return the number of bottles in the group."""
+        group = self._group
+        return group["count"] if group is not None else None
+
+    @property
+    def extra_state_attributes(self):
+        group = self._group or {}
+        return {
+            "dimension": self._dimension,
+            "value_total": group.get("value_total"),
+            "value_avg": group.get("value_avg"),
+        }
+
+    @callback
+    def _handle_coordinator_update(self):
+        """Handle updated data from the coordinator.
+
+        The state is only written when the values of this group have changed.
+        """
+        written = self._group
+        if written == self._written:
+            return
+        self._written = written
+        return super()._handle_coordinator_update()
+
+
+class WinePastPeakSensor(CoordinatorEntity, SensorEntity):
+    """Represent a sensor for the bottles whose drinking window has ended."""
+
+    _attr_state_class = SensorStateClass.MEASUREMENT
+
+    def __init__(self, entry, username, coordinator):
+        """Set up a new HA Cellar Tracker past peak sensor."""
+        self._entry = entry
+        self._username = username
+        self._entity_type = "sensor"
+        self._written = None
+        super().__init__(coordinator)
+
+    @property
+    def icon(self) -> str:
+        """Return icon."""
+        return "mdi:glass-wine"
+
+    @property
+    def name(self) -> str:
+        """Return the name of this sensor including the user's name."""
+        return f"{self._username} Wine Past Peak"
+
+    @property
+    def unique_id(self) -> str:
+        """Return a unique, Home Assistant friendly identifier for this entity."""
+        return slugify(f"{self._entity_type}_{self._username}_wine_past_peak")
+
+    @property
+    def native_unit_of_measurement(self) -> str:
+        """The unit of measurement that the sensor's value is expressed in."""
+        return "bottles"
+
+    @property
+    def available(self) -> bool:
+        """Return True while there is inventory data, even if it is stale."""
+        return self.coordinator.data is not None
+
+    @property
+    def native_value(self) -> int | None:
+        """Return the number of bottles whose drinking window ended before this year."""
+        if self.coordinator.data is None:
+            return None
+        return self.coordinator.data.drinking_windows.count_past_peak(dt_util.now().year)
+
+    @callback
+    def _handle_coordinator_update(self):
+        """Handle updated data from the coordinator.
+
+        The state is only written when the number of bottles past peak has changed.
+        """
+        written = self.native_value
+        if written == self._written:
+            return
+        self._written = written
+        return super()._handle_coordinator_update()
+
+
+class WinePerformanceSensor(SensorEntity):
+    """Represent a diagnostic sensor for the duration of a refresh or service."""
+
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+    _attr_native_unit_of_measurement = UnitOfTime.MILLISECONDS
+    _attr_should_poll = False
+    _attr_state_class = SensorStateClass.MEASUREMENT
+
+    def __init__(self, entry, username, coordinator, operation):
+        """Set up a new HA Cellar Tracker performance sensor."""
+        self._entry = entry
+        self._username = username
+        self._entity_type = "sensor"
+        self._operation = operation
+        self._stats = coordinator.metrics.get(operation)
+        self._metrics = coordinator.metrics
+
+    @property
+    def icon(self) -> str:
+        """Return icon."""
+        return "mdi:timer-outline"
+
+    @property
+    def name(self) -> str:
+        """Return the name of this sensor including the user's name."""
+        return f"{self._username} Wine Cellar {self._operation.replace('_', ' ').title()} Duration"
+
+    @property
+    def unique_id(self) -> str:
+        """Return a unique, Home Assistant friendly identifier for this entity."""
+        return slugify(f"{self._entity_type}_{self._username}_wine_cellar_{self._operation}_duration")
+
+    @property
+    def native_value(self) -> float | None:
+        """Return the 95th percentile of the recent durations in milliseconds."""
+        p95 = self._stats.percentile(95)
+        return round(p95 * 1000, 1) if p95 is not None else None
+
+    @property
+    def extra_state_attributes(self):
+        def ms(seconds):
+            return round(seconds * 1000, 1) if seconds is not None else None
+
+        return {
+            "count": self._stats.count,
+            "last": ms(self._stats.last),
+            "peak": ms(self._stats.peak),
+            "median": ms(self._stats.percentile(50)),
+            "rows": self._stats.rows,
+            "bytes": self._stats.size,
+            "peak_bytes": self._stats.peak_size,
+        }
+
+    async def async_added_to_hass(self) -> None:
+        """Write the state whenever the operation has run."""
+        await super().async_added_to_hass()
+        self.async_on_remove(self._metrics.async_add_listener(self._handle_metrics_update))
+
+    @callback
+    def _handle_metrics_update(self, operation: str) -> None:
+        """Handle a new measurement."""
+        if operation == self._operation:
+            self.async_write_ha_state()
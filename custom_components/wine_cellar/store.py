@@ -0,0 +1,86 @@
+"""Local inventory cache for the Home Assistant Wine Cellar integration."""
+from __future__ import annotations
+
+from datetime import datetime
+import logging
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN, STORAGE_VERSION
+from .inventory import InventorySnapshot
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def _to_payload(snapshot: InventorySnapshot) -> dict[str, Any]:
+    """Encode a snapshot as a header of field names and one list of values per bottle."""
+    fields = list(snapshot.fields)
+    return {
+        "fetched": snapshot.fetched.isoformat(),
+        "content_hash": snapshot.content_hash,
+        "fields": fields,
+        "rows": [list(row) for row in zip(*(snapshot.column(field) for field in fields))],
+    }
+
+
+def _from_payload(payload: dict[str, Any], generation: int) -> InventorySnapshot:
+    """Decode a snapshot stored by _to_payload."""
+    fields = payload["fields"]
+    return InventorySnapshot.from_inventory(
+        [dict(zip(fields, row)) for row in payload["rows"]],
+        generation,
+        payload["content_hash"],
+        datetime.fromisoformat(payload["fetched"]),
+    )
+
+
+class InventoryStore:
+    """Persist the last good inventory of an account in local storage.
+
+    The inventory is only saved when it changes, while the time it was last
+    confirmed by CellarTracker is saved after every successful download, in
+    a separate small store.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        """Initialize the store for a config entry."""
+        self._hass = hass
+        self._store = Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}.inventory")
+        self._synced_store = Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}.synced")
+
+    async def async_load(self, generation: int) -> InventorySnapshot | None:
+        """Return the stored snapshot, or None if there is no usable cache."""
+        try:
+            payload = await self._store.async_load()
+            if not payload:
+                return None
+            return await self._hass.async_add_executor_job(_from_payload, payload, generation)
+        except (HomeAssistantError, KeyError, TypeError, ValueError) as exc:
+            _LOGGER.warning(f"Ignoring unreadable inventory cache: {str(exc)}")
+            return None
+
+    async def async_load_synced(self) -> datetime | None:
+        """Return the time the stored inventory was last confirmed, or None if it is unknown."""
+        try:
+            data = await self._synced_store.async_load()
+            return datetime.fromisoformat(data["last_synced"]) if data else None
+        except (HomeAssistantError, KeyError, TypeError, ValueError) as exc:
+            _LOGGER.warning(f"Ignoring unreadable sync time: {str(exc)}")
+            return None
+
+    async def async_save_synced(self, time: datetime) -> None:
+        """Store the time the inventory was last confirmed by CellarTracker."""
+        await self._synced_store.async_save({"last_synced": time.isoformat()})
+
+    async def async_save(self, snapshot: InventorySnapshot) -> None:
+        """Store a snapshot, replacing the previous one."""
+        payload = await self._hass.async_add_executor_job(_to_payload, snapshot)
+        await self._store.async_save(payload)
+
+    async def async_remove(self) -> None:
+        """Remove the stored inventory and sync time."""
+        await self._store.async_remove()
+        await self._synced_store.async_remove()
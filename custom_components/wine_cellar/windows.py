@@ -0,0 +1,72 @@
+"""Drinking window index for the Home Assistant Wine Cellar integration."""
+from __future__ import annotations
+
+from array import array
+from collections.abc import Sequence
+from itertools import accumulate
+from math import inf, isnan
+
+
+class DrinkingWindowIndex:
+    """Bottles grouped by their drinking window, from BeginConsume to EndConsume.
+
+    A cellar has few distinct windows compared to bottles, so queries visit
+    the windows rather than the bottles. A window open at one end extends to
+    the first or last year of the cellar; bottles without any window are
+    left out, and a window entered the wrong way round, ending before it
+    begins, is read in order. The number of bottles in their window each
+    year is counted once, when the index is built.
+    """
+
+    __slots__ = ("_windows", "first_year", "last_year", "_counts")
+
+    def __init__(self, begin: Sequence[float], end: Sequence[float]) -> None:
+        """Build the index from the typed BeginConsume and EndConsume columns, NaN where empty."""
+        groups: dict[tuple[float, float], list[int]] = {}
+        for index, (first, last) in enumerate(zip(begin, end)):
+            if isnan(first) and isnan(last):
+                continue
+            key = (-inf if isnan(first) else int(first), inf if isnan(last) else int(last))
+            if key[0] > key[1]:
+                key = (key[1], key[0])
+            groups.setdefault(key, []).append(index)
+        self._windows = {key: array("I", indices) for key, indices in sorted(groups.items())}
+
+        years = [year for key in self._windows for year in key if year not in (-inf, inf)]
+        self.first_year: int | None = min(years) if years else None
+        self.last_year: int | None = max(years) if years else None
+
+        # Count the bottles in their window each year with a difference array.
+        self._counts = array("i")
+        if self.first_year is not None:
+            changes = [0] * (self.last_year - self.first_year + 2)
+            for (first, last), indices in self._windows.items():
+                changes[0 if first == -inf else first - self.first_year] += len(indices)
+                changes[len(changes) - 1 if last == inf else last - self.first_year + 1] -= len(indices)
+            self._counts = array("i", accumulate(changes[:-1]))
+
+    def __len__(self) -> int:
+        """Return the number of bottles with a drinking window."""
+        return sum(len(indices) for indices in self._windows.values())
+
+    def _select(self, keep) -> list[int]:
+        """Return the positions of the bottles of the windows kept, in CellarTracker order."""
+        return sorted(index for key, indices in self._windows.items() if keep(*key) for index in indices)
+
+    def ready(self, year: int) -> list[int]:
+        """Return the bottles whose drinking window includes a year."""
+        return self._select(lambda first, last: first <= year <= last)
+
+    def expiring(self, year: int, years: int) -> list[int]:
+        """Return the bottles whose drinking window ends from a year to years later."""
+        return self._select(lambda first, last: year <= last <= year + years)
+
+    def count_past_peak(self, year: int) -> int:
+        """Return the number of bottles whose drinking window ended before a year."""
+        return sum(len(indices) for (first, last), indices in self._windows.items() if last < year)
+
+    def counts_per_year(self) -> dict[int, int]:
+        """Return the number of bottles in their drinking window for each year of the cellar."""
+        if self.first_year is None:
+            return {}
+        return {self.first_year + offset: count for offset, count in enumerate(self._counts)}
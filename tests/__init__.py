@@ -0,0 +1 @@
+"""Tests for the Home Assistant Wine Cellar integration."""
@@ -0,0 +1,128 @@
+"""Fixtures for the Home Assistant Wine Cellar integration tests."""
+from __future__ import annotations
+
+from collections.abc import Generator
+from unittest.mock import MagicMock, patch
+
+import pytest
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from homeassistant.const import CONF_PASSWORD, CONF_USERNAME
+from homeassistant.core import HomeAssistant
+
+from custom_components.wine_cellar.const import DOMAIN, INVENTORY_FIELDS
+
+USERNAME = "cellarist"
+
+
+def make_bottle(**values: str) -> dict:
+    """Return an inventory row as returned by CellarTracker, with values overridden."""
+    bottle = dict.fromkeys(INVENTORY_FIELDS, "")
+    bottle |= {
+        "iInventory": "1",
+        "Barcode": "0001",
+        "Location": "Cellar",
+        "Bin": "A1",
+        "Size": "750ml",
+        "Currency": "USD",
+        "ExchangeRate": "1",
+        "Valuation": "40",
+        "Price": "30",
+        "NativePrice": "30",
+        "NativePriceCurrency": "USD",
+        "StoreName": "Wine Shop",
+        "PurchaseDate": "1/15/2020",
+        "BottleNote": "",
+        "iWine": "100",
+        "Type": "Red",
+        "Color": "Red",
+        "Category": "Dry",
+        "Vintage": "2015",
+        "Wine": "Chateau Test Cabernet",
+        "Locale": "USA, California, Napa Valley",
+        "Producer": "Chateau Test",
+        "Varietal": "Cabernet Sauvignon",
+        "MasterVarietal": "Cabernet Sauvignon",
+        "Designation": "",
+        "Vineyard": "",
+        "Country": "USA",
+        "Region": "California",
+        "SubRegion": "Napa Valley",
+        "Appellation": "Napa Valley",
+        "BeginConsume": "2020",
+        "EndConsume": "2030",
+    }
+    bottle.update(values)
+    return bottle
+
+
+INVENTORY = [
+    make_bottle(),
+    make_bottle(iInventory="2", Barcode="0002", Bin="A2", Valuation="45.6", Price="30.4"),
+    make_bottle(
+        iInventory="3", Barcode="0003", iWine="200", Wine="Domaine Essai Pinot Noir", Producer="Domaine Essai",
+        Varietal="Pinot Noir", MasterVarietal="Pinot Noir", Country="France", Region="Burgundy",
+        SubRegion="Cote de Nuits", Appellation="Gevrey-Chambertin", Locale="France, Burgundy, Cote de Nuits",
+        Location="Fridge", Bin="", Valuation="120", Price="80", Vintage="2010", BeginConsume="2015",
+        EndConsume="2022", PurchaseDate="3/1/2014",
+    ),
+    make_bottle(
+        iInventory="4", Barcode="0004", iWine="300", Wine="Bodega Prueba Cava", Producer="Bodega Prueba",
+        Type="White - Sparkling", Color="White", Category="Sparkling", Varietal="Macabeo",
+        MasterVarietal="Macabeo", Country="Spain", Region="Catalunya", SubRegion="Penedes",
+        Appellation="Cava", Locale="Spain, Catalunya, Penedes", Valuation="", Price="15", Vintage="1001",
+        BeginConsume="", EndConsume="", PurchaseDate="",
+    ),
+]
+
+
+@pytest.fixture(autouse=True)
+def auto_enable_custom_integrations(enable_custom_integrations: None) -> None:
+    """Enable the loading of custom integrations in all tests."""
+
+
+@pytest.fixture
+def inventory() -> list[dict]:
+    """Return the inventory served by the mocked CellarTracker account."""
+    return [dict(bottle) for bottle in INVENTORY]
+
+
+@pytest.fixture
+def mock_cellartracker(inventory: list[dict]) -> Generator[MagicMock, None, None]:
+    """Mock the CellarTracker client of the integration."""
+    with patch(
+        "custom_components.wine_cellar.cellartracker.CellarTracker", autospec=True
+    ) as client_class:
+        client = client_class.return_value
+        client.get_inventory.return_value = inventory
+        client.get_food_tag.return_value = []
+        yield client
+
+
+@pytest.fixture
+def entry_options() -> dict:
+    """Return the options of the config entry, overridden by parametrizing the fixture."""
+    return {}
+
+
+@pytest.fixture
+def config_entry(entry_options: dict) -> MockConfigEntry:
+    """Return the config entry of a CellarTracker account."""
+    return MockConfigEntry(
+        domain=DOMAIN,
+        title=USERNAME,
+        unique_id=USERNAME,
+        data={CONF_USERNAME: USERNAME, CONF_PASSWORD: "secret"},
+        options=entry_options,
+    )
+
+
+@pytest.fixture
+async def setup_integration(
+    hass: HomeAssistant, config_entry: MockConfigEntry, mock_cellartracker: MagicMock
+) -> MockConfigEntry:
+    """Set up the integration with the mocked account."""
+    config_entry.add_to_hass(hass)
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+    return config_entry
@@ -0,0 +1,107 @@
+"""Tests for the service response cache of the Home Assistant Wine Cellar integration."""
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from custom_components.wine_cellar.cache import ServiceResultCache
+
+
+async def test_results_cached_per_generation() -> None:
+    """Test that a result is computed once per call parameters and generation."""
+    cache = ServiceResultCache(8)
+    calls = []
+
+    async def compute() -> int:
+        calls.append(None)
+        return len(calls)
+
+    assert await cache.async_get("get_types", {"limit": 2, "sort_by": "count"}, 1, compute) == 1
+    assert await cache.async_get("get_types", {"sort_by": "count", "limit": 2}, 1, compute) == 1
+    assert await cache.async_get("get_types", {"limit": 2, "sort_by": "count"}, 2, compute) == 2
+
+    cache.invalidate()
+    assert await cache.async_get("get_types", {"limit": 2, "sort_by": "count"}, 2, compute) == 3
+
+
+async def test_least_recently_used_evicted() -> None:
+    """Test that the least recently used result is dropped beyond the maximum."""
+    cache = ServiceResultCache(2)
+
+    async def compute() -> object:
+        return object()
+
+    first = await cache.async_get("get_types", {}, 1, compute)
+    await cache.async_get("get_countries", {}, 1, compute)
+    assert await cache.async_get("get_types", {}, 1, compute) is first
+    await cache.async_get("get_locations", {}, 1, compute)
+
+    assert len(cache) == 2
+    assert await cache.async_get("get_types", {}, 1, compute) is first
+
+
+async def test_identical_calls_coalesced() -> None:
+    """Test that calls arriving during a computation wait for it."""
+    cache = ServiceResultCache(8)
+    release = asyncio.Event()
+    calls = []
+
+    async def compute() -> str:
+        calls.append(None)
+        await release.wait()
+        return "result"
+
+    first = asyncio.create_task(cache.async_get("get_types", {}, 1, compute))
+    second = asyncio.create_task(cache.async_get("get_types", {}, 1, compute))
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await first == await second == "result"
+    assert len(calls) == 1
+
+
+async def test_cancelled_caller_leaves_computation_to_others() -> None:
+    """Test that cancelling the caller that started a computation does not cancel the others."""
+    cache = ServiceResultCache(8)
+    release = asyncio.Event()
+
+    async def compute() -> str:
+        await release.wait()
+        return "result"
+
+    first = asyncio.create_task(cache.async_get("get_types", {}, 1, compute))
+    await asyncio.sleep(0)
+    second = asyncio.create_task(cache.async_get("get_types", {}, 1, compute))
+    await asyncio.sleep(0)
+
+    first.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await first
+    release.set()
+
+    assert await second == "result"
+    assert await cache.async_get("get_types", {}, 1, compute) == "result"
+
+
+async def test_failure_shared_and_not_cached() -> None:
+    """Test that a failed computation fails its waiters and is retried by the next call."""
+    cache = ServiceResultCache(8)
+    release = asyncio.Event()
+
+    async def fail() -> str:
+        await release.wait()
+        raise ValueError("failed")
+
+    async def succeed() -> str:
+        return "result"
+
+    first = asyncio.create_task(cache.async_get("get_types", {}, 1, fail))
+    second = asyncio.create_task(cache.async_get("get_types", {}, 1, fail))
+    await asyncio.sleep(0)
+    release.set()
+
+    for caller in (first, second):
+        with pytest.raises(ValueError, match="failed"):
+            await caller
+    assert await cache.async_get("get_types", {}, 1, succeed) == "result"
@@ -0,0 +1,142 @@
+"""Tests for the aggregation engines of the Home Assistant Wine Cellar integration."""
+from __future__ import annotations
+
+import pytest
+
+from custom_components.wine_cellar.const import ENGINE_PANDAS, ENGINE_PYTHON
+from custom_components.wine_cellar.engine import ENGINES, AggregationEngine
+from custom_components.wine_cellar.inventory import InventorySnapshot
+
+from .conftest import INVENTORY
+
+METRICS = ["count", "valuation_sum", "valuation_mean", "valuation_median", "price_max", "percent"]
+
+
+def _normalized(rows: list[dict]) -> list[dict]:
+    """Return rows with NaN as None and floats rounded, to compare the engines."""
+    return [
+        {
+            key: (None if value != value else round(float(value), 6)) if isinstance(value, float) else value
+            for key, value in row.items()
+        }
+        for row in rows
+    ]
+
+
+@pytest.fixture(params=[ENGINE_PYTHON, ENGINE_PANDAS])
+def engine(request: pytest.FixtureRequest) -> AggregationEngine:
+    """Return each aggregation engine, skipping pandas when it is not installed."""
+    if request.param == ENGINE_PANDAS:
+        pytest.importorskip("pandas")
+    return ENGINES[request.param]
+
+
+@pytest.fixture
+def snapshot() -> InventorySnapshot:
+    """Return a prepared snapshot of the test inventory."""
+    return InventorySnapshot.from_inventory([dict(bottle) for bottle in INVENTORY], 1)
+
+
+@pytest.fixture
+def empty() -> InventorySnapshot:
+    """Return a snapshot of an empty inventory."""
+    return InventorySnapshot.from_inventory([], 1)
+
+
+def test_summarize(engine: AggregationEngine, snapshot: InventorySnapshot) -> None:
+    """Test the metrics of each group, sorted by key."""
+    engine.prepare(snapshot)
+
+    rows = engine.summarize(snapshot, ["Location"], METRICS)
+
+    assert [row["Location"] for row in rows] == ["Cellar", "Fridge"]
+    cellar, fridge = rows
+    assert cellar["count"] == 3
+    assert cellar["price_max"] == pytest.approx(30.4)
+    assert cellar["percent"] == 75
+    assert fridge["count"] == 1
+    assert fridge["valuation_sum"] == 120
+    assert fridge["valuation_median"] == 120
+
+
+def test_summarize_unrounded(engine: AggregationEngine, snapshot: InventorySnapshot) -> None:
+    """Test that metrics are computed from the exact values, or from rounded ones if asked."""
+    engine.prepare(snapshot)
+    metrics = ["valuation_sum", "valuation_max", "price_min", "price_mean"]
+
+    exact = engine.summarize(snapshot, ["Location"], metrics)[0]
+    rounded = engine.summarize(snapshot, ["Location"], metrics, rounded=True)[0]
+
+    assert exact["valuation_sum"] == pytest.approx(85.6)
+    assert exact["valuation_max"] == pytest.approx(45.6)
+    assert exact["price_min"] == pytest.approx(15)
+    assert exact["price_mean"] == pytest.approx(75.4 / 3)
+    assert rounded["valuation_sum"] == 86
+    assert rounded["valuation_max"] == 46
+    assert rounded["price_mean"] == pytest.approx(25)
+
+
+def test_legacy_summaries_rounded(engine: AggregationEngine, snapshot: InventorySnapshot) -> None:
+    """Test that the inventory summary, group summaries and sensors aggregate rounded values."""
+    engine.prepare(snapshot)
+
+    assert engine.summary(snapshot) == {"total_bottles": 4, "total_value": 206, "average_value": 69}
+    assert engine.group_summary(snapshot, "Location")[0]["value_total"] == 86
+    assert engine.aggregate(snapshot, ["Location"]).dimensions["Location"]["Cellar"] == {
+        "count": 3, "value_total": 86, "value_avg": 43,
+    }
+
+
+def test_summarize_sorted_and_limited(engine: AggregationEngine, snapshot: InventorySnapshot) -> None:
+    """Test that groups are ranked by a metric, with ties in key order, and limited."""
+    engine.prepare(snapshot)
+
+    rows = engine.summarize(snapshot, ["Country"], ["count"], sort_by="count", descending=True, limit=2)
+
+    assert rows == [{"Country": "USA", "count": 2}, {"Country": "France", "count": 1}]
+
+
+def test_summarize_empty(engine: AggregationEngine, empty: InventorySnapshot) -> None:
+    """Test that an empty inventory has no groups."""
+    engine.prepare(empty)
+
+    assert engine.summarize(empty, ["Location"], METRICS) == []
+    assert engine.summarize(empty, ["Location"], METRICS, sort_by="count", limit=1) == []
+
+
+def test_engines_agree(snapshot: InventorySnapshot) -> None:
+    """Test that both engines return the same summaries."""
+    pytest.importorskip("pandas")
+    python, pandas = ENGINES[ENGINE_PYTHON], ENGINES[ENGINE_PANDAS]
+    pandas.prepare(snapshot)
+
+    for group_by in (["Location"], ["Country", "Type"], ["Vintage"]):
+        assert _normalized(pandas.summarize(snapshot, group_by, METRICS)) == _normalized(
+            python.summarize(snapshot, group_by, METRICS)
+        )
+    assert pandas.summary(snapshot) == python.summary(snapshot)
+    assert _normalized(pandas.group_summary(snapshot, "Country")) == _normalized(
+        python.group_summary(snapshot, "Country")
+    )
+
+
+def test_summarize_many(engine: AggregationEngine, snapshot: InventorySnapshot) -> None:
+    """Test that each dimension is summarized like with summarize."""
+    engine.prepare(snapshot)
+
+    summaries = engine.summarize_many(snapshot, ["Location", "Country"], METRICS, sort_by="count", limit=2)
+
+    assert list(summaries) == ["Location", "Country"]
+    for dimension, rows in summaries.items():
+        assert _normalized(rows) == _normalized(
+            engine.summarize(snapshot, [dimension], METRICS, sort_by="count", limit=2)
+        )
+
+
+def test_summarize_many_empty(engine: AggregationEngine, empty: InventorySnapshot) -> None:
+    """Test that an empty inventory has no groups in any dimension."""
+    engine.prepare(empty)
+
+    assert engine.summarize_many(empty, ["Location", "Country"], METRICS) == {"Location": [], "Country": []}
+    assert engine.aggregate(empty, ["Location"]).dimensions == {"Location": {}}
+    assert engine.summary(empty) == {"total_bottles": 0, "total_value": 0, "average_value": 0}
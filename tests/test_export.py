@@ -0,0 +1,65 @@
+"""Tests for the inventory export of the Home Assistant Wine Cellar integration."""
+from __future__ import annotations
+
+import csv
+import json
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from custom_components.wine_cellar.const import EXPORT_CSV, EXPORT_JSONL
+from custom_components.wine_cellar.export import export_inventory
+from custom_components.wine_cellar.inventory import InventorySnapshot
+
+from .conftest import INVENTORY
+
+FIELDS = ["Barcode", "Wine", "Valuation"]
+
+
+@pytest.fixture
+def snapshot() -> InventorySnapshot:
+    """Return a snapshot of the test inventory."""
+    return InventorySnapshot.from_inventory([dict(bottle) for bottle in INVENTORY], 1)
+
+
+def test_export_csv(snapshot: InventorySnapshot, tmp_path: Path) -> None:
+    """Test that the selected bottles are written as CSV, a chunk at a time."""
+    path = tmp_path / "export" / "inventory.csv"
+
+    size = export_inventory(snapshot, [0, 2, 3], FIELDS, str(path), EXPORT_CSV, 2)
+
+    with open(path, newline="", encoding="utf-8") as file:
+        rows = list(csv.reader(file))
+    assert rows == [
+        FIELDS,
+        ["0001", "Chateau Test Cabernet", "40"],
+        ["0003", "Domaine Essai Pinot Noir", "120"],
+        ["0004", "Bodega Prueba Cava", ""],
+    ]
+    assert size == path.stat().st_size
+
+
+def test_export_jsonl(snapshot: InventorySnapshot, tmp_path: Path) -> None:
+    """Test that the selected bottles are written as JSON Lines."""
+    path = tmp_path / "inventory.jsonl"
+
+    export_inventory(snapshot, [1], FIELDS, str(path), EXPORT_JSONL, 1000)
+
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line) for line in lines] == [
+        {"Barcode": "0002", "Wine": "Chateau Test Cabernet", "Valuation": "45.6"}
+    ]
+
+
+def test_failed_export_keeps_previous_file(snapshot: InventorySnapshot, tmp_path: Path) -> None:
+    """Test that a failed export leaves the previous file and no temporary file."""
+    path = tmp_path / "inventory.csv"
+    path.write_text("previous", encoding="utf-8")
+
+    with patch("custom_components.wine_cellar.export.csv.writer", side_effect=OSError("disk full")):
+        with pytest.raises(OSError, match="disk full"):
+            export_inventory(snapshot, [0], FIELDS, str(path), EXPORT_CSV, 1000)
+
+    assert path.read_text(encoding="utf-8") == "previous"
+    assert [entry.name for entry in tmp_path.iterdir()] == ["inventory.csv"]
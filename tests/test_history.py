@@ -0,0 +1,55 @@
+"""Tests for the valuation history of the Home Assistant Wine Cellar integration."""
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta
+
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
+
+from custom_components.wine_cellar.engine import InventoryAggregates
+from custom_components.wine_cellar.history import ValuationHistory
+
+
+def _aggregates(bottles: int, value: float) -> InventoryAggregates:
+    """Return the aggregates of a refresh with one location holding every bottle."""
+    return InventoryAggregates(
+        generation=1,
+        summary={"total_bottles": bottles, "total_value": value, "average_value": 0},
+        dimensions={"Location": {"Cellar": {"count": bottles, "value_total": value, "value_avg": 0}}},
+    )
+
+
+async def test_points_downsampled_as_they_age(hass: HomeAssistant) -> None:
+    """Test that points older than a week are kept one per day, the last of each day."""
+    start = dt_util.start_of_local_day(date(2024, 1, 1))
+    history = ValuationHistory(hass, "entry")
+    for hour in range(0, 24 * 10, 6):
+        history.async_append(start + timedelta(hours=hour), _aggregates(hour, hour * 10.0))
+
+    points = history.query()
+    times = [datetime.fromisoformat(point["time"]) for point in points]
+    # Four points a day for ten days, of which those before the last week are kept one per day.
+    assert len(points) == 3 + 7 * 4 + 1
+    assert times == sorted(times)
+    assert points[0]["bottles"] == 18
+    assert points[-1]["bottles"] == 234
+
+    await history.async_flush()
+
+
+async def test_query_range_resolution_and_dimensions(hass: HomeAssistant) -> None:
+    """Test that a query keeps the points in range, one per day, with the requested dimensions."""
+    start = dt_util.start_of_local_day(date(2024, 1, 1))
+    history = ValuationHistory(hass, "entry")
+    for hour in range(0, 48, 12):
+        history.async_append(start + timedelta(hours=hour), _aggregates(hour, 100.0))
+
+    points = history.query(
+        start=start + timedelta(hours=12), resolution="day", dimensions=["Location"]
+    )
+
+    assert [point["bottles"] for point in points] == [12, 36]
+    assert points[0]["Location"] == [{"Location": "Cellar", "count": 12, "value_total": 100.0}]
+    assert "Location" not in history.query()[0]
+
+    await history.async_flush()
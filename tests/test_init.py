@@ -0,0 +1,186 @@
+"""Tests for the setup and coordinator of the Home Assistant Wine Cellar integration."""
+from __future__ import annotations
+
+from datetime import timedelta
+from typing import Any
+from unittest.mock import MagicMock
+
+import pytest
+from pytest_homeassistant_custom_component.common import (
+    MockConfigEntry,
+    async_capture_events,
+    async_fire_time_changed,
+)
+
+from cellartracker.errors import CannotConnect
+
+from homeassistant.config_entries import ConfigEntryState
+from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import ServiceValidationError
+from homeassistant.util import dt as dt_util
+
+from custom_components.wine_cellar.const import (
+    CURSOR_SNAPSHOT_SECONDS,
+    DOMAIN,
+    EVENT_BOTTLE_ADDED,
+    EVENT_BOTTLE_MOVED,
+    EVENT_BOTTLE_REMOVED,
+    SERVICE_GET_INVENTORY,
+)
+
+from .conftest import make_bottle
+
+INVENTORY_SENSOR = "sensor.cellarist_wine_inventory"
+
+
+async def _get_inventory(hass: HomeAssistant, **data) -> dict:
+    """Call get_inventory on the inventory sensor and return its response."""
+    response = await hass.services.async_call(
+        DOMAIN,
+        SERVICE_GET_INVENTORY,
+        {"entity_id": INVENTORY_SENSOR, "fields": ["Barcode"], **data},
+        blocking=True,
+        return_response=True,
+    )
+    return response[INVENTORY_SENSOR]
+
+
+async def _refresh(hass: HomeAssistant, entry: MockConfigEntry) -> None:
+    """Refresh the inventory of an entry right away."""
+    await hass.data[DOMAIN][entry.entry_id]["coordinator"].async_refresh()
+    await hass.async_block_till_done()
+
+
+async def test_cursor_outlives_refresh_until_expiry(
+    hass: HomeAssistant,
+    setup_integration: MockConfigEntry,
+    mock_cellartracker: MagicMock,
+    inventory: list[dict],
+) -> None:
+    """Test that a cursor keeps paging its snapshot after a refresh, until the snapshot expires."""
+    first = await _get_inventory(hass, limit=2)
+    assert [bottle["Barcode"] for bottle in first["inventory"]] == ["0001", "0002"]
+    assert first["total"] == 4
+
+    mock_cellartracker.get_inventory.return_value = inventory[1:]
+    await _refresh(hass, setup_integration)
+
+    second = await _get_inventory(hass, limit=2, cursor=first["next_cursor"])
+    assert [bottle["Barcode"] for bottle in second["inventory"]] == ["0003", "0004"]
+    assert second["next_cursor"] is None
+
+    async_fire_time_changed(hass, dt_util.utcnow() + timedelta(seconds=CURSOR_SNAPSHOT_SECONDS + 1))
+    await hass.async_block_till_done()
+
+    with pytest.raises(ServiceValidationError, match="cursor has expired"):
+        await _get_inventory(hass, limit=2, cursor=first["next_cursor"])
+
+
+async def test_unload_cancels_snapshot_expiry(
+    hass: HomeAssistant,
+    setup_integration: MockConfigEntry,
+    mock_cellartracker: MagicMock,
+    inventory: list[dict],
+) -> None:
+    """Test that unloading the entry leaves no timer behind for the previous snapshots."""
+    for count in (3, 2, 1):
+        mock_cellartracker.get_inventory.return_value = inventory[:count]
+        await _refresh(hass, setup_integration)
+
+    assert await hass.config_entries.async_unload(setup_integration.entry_id)
+    await hass.async_block_till_done()
+
+    assert setup_integration.state is ConfigEntryState.NOT_LOADED
+
+
+async def test_unload_saves_history_before_removal(
+    hass: HomeAssistant,
+    hass_storage: dict[str, Any],
+    setup_integration: MockConfigEntry,
+) -> None:
+    """Test that unloading writes the pending history, and removing the entry then deletes it."""
+    key = f"{DOMAIN}.{setup_integration.entry_id}.history"
+    assert key not in hass_storage
+
+    assert await hass.config_entries.async_unload(setup_integration.entry_id)
+    [point] = hass_storage[key]["data"]["raw"]
+    assert point[1:3] == [4, 206]
+
+    assert await hass.config_entries.async_remove(setup_integration.entry_id)
+    await hass.async_block_till_done()
+    assert key not in hass_storage
+
+
+async def test_change_events(
+    hass: HomeAssistant,
+    setup_integration: MockConfigEntry,
+    mock_cellartracker: MagicMock,
+    inventory: list[dict],
+) -> None:
+    """Test that an event is fired for each bottle added, removed or moved, even without a barcode."""
+    added = async_capture_events(hass, EVENT_BOTTLE_ADDED)
+    removed = async_capture_events(hass, EVENT_BOTTLE_REMOVED)
+    moved = async_capture_events(hass, EVENT_BOTTLE_MOVED)
+
+    mock_cellartracker.get_inventory.return_value = [
+        inventory[0],
+        {**inventory[1], "Location": "Fridge", "Bin": "F1"},
+        make_bottle(iInventory="5", Barcode=""),
+        make_bottle(iInventory="6", Barcode=""),
+    ]
+    await _refresh(hass, setup_integration)
+
+    assert [event.data["Barcode"] for event in added] == ["", ""]
+    assert sorted(event.data["Barcode"] for event in removed) == ["0003", "0004"]
+    [event] = moved
+    assert event.data["Location"] == "Fridge"
+    assert event.data["previous_location"] == "Cellar"
+    assert event.data["previous_bin"] == "A2"
+
+
+async def test_polling_slows_down_while_unchanged(
+    hass: HomeAssistant,
+    setup_integration: MockConfigEntry,
+    mock_cellartracker: MagicMock,
+    inventory: list[dict],
+) -> None:
+    """Test that the next poll is later after an unchanged refresh and sooner after a change."""
+    coordinator = hass.data[DOMAIN][setup_integration.entry_id]["coordinator"]
+
+    await _refresh(hass, setup_integration)
+    assert coordinator.update_interval == timedelta(hours=2)
+
+    mock_cellartracker.get_inventory.return_value = inventory[:2]
+    await _refresh(hass, setup_integration)
+    assert coordinator.update_interval == timedelta(minutes=15)
+
+
+async def test_setup_from_cache_when_offline(
+    hass: HomeAssistant,
+    setup_integration: MockConfigEntry,
+    mock_cellartracker: MagicMock,
+) -> None:
+    """Test that the last good inventory is served when CellarTracker cannot be reached."""
+    assert await hass.config_entries.async_unload(setup_integration.entry_id)
+    mock_cellartracker.get_food_tag.side_effect = CannotConnect
+    mock_cellartracker.get_inventory.side_effect = CannotConnect
+
+    assert await hass.config_entries.async_setup(setup_integration.entry_id)
+    await hass.async_block_till_done()
+
+    assert setup_integration.state is ConfigEntryState.LOADED
+    assert hass.states.get(INVENTORY_SENSOR).state == "4"
+    assert hass.states.get("sensor.cellarist_wine_inventory_last_synced").state != "unavailable"
+
+
+async def test_setup_retried_without_cache(
+    hass: HomeAssistant,
+    config_entry: MockConfigEntry,
+    mock_cellartracker: MagicMock,
+) -> None:
+    """Test that the setup is retried when CellarTracker cannot be reached and nothing is cached."""
+    mock_cellartracker.get_food_tag.side_effect = CannotConnect
+    config_entry.add_to_hass(hass)
+
+    assert not await hass.config_entries.async_setup(config_entry.entry_id)
+    assert config_entry.state is ConfigEntryState.SETUP_RETRY
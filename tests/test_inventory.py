@@ -0,0 +1,102 @@
+"""Tests for the inventory snapshot of the Home Assistant Wine Cellar integration."""
+from __future__ import annotations
+
+from datetime import date
+
+from custom_components.wine_cellar.inventory import InventorySnapshot
+
+from .conftest import INVENTORY, make_bottle
+
+
+def _snapshot(inventory: list[dict], generation: int = 1) -> InventorySnapshot:
+    """Return a snapshot of an inventory."""
+    return InventorySnapshot.from_inventory(inventory, generation)
+
+
+def test_typed_columns() -> None:
+    """Test that numeric fields are parsed, with empty and non-vintage values left out."""
+    snapshot = _snapshot(INVENTORY)
+
+    assert len(snapshot) == 4
+    assert snapshot.valuation[1] == 45.6
+    assert snapshot.valuation[3] != snapshot.valuation[3]
+    assert snapshot.vintage[3] != snapshot.vintage[3]
+    assert snapshot.purchase_date_at(0) == date(2020, 1, 15)
+    assert snapshot.purchase_date_at(3) is None
+    assert dict(snapshot.bottles[2])["Wine"] == "Domaine Essai Pinot Noir"
+
+
+def test_top() -> None:
+    """Test that bottles are ranked by a typed column, without empty values."""
+    snapshot = _snapshot(INVENTORY)
+
+    assert snapshot.top("Valuation", 2) == [2, 1]
+    assert snapshot.top("Valuation", 10, descending=False) == [0, 1, 2]
+    assert snapshot.top("Vintage", 10) == [0, 1, 2]
+    assert snapshot.top("Price", 1, indices=[0, 3]) == [0]
+
+
+def test_select() -> None:
+    """Test that bottles are selected on values and ranges."""
+    snapshot = _snapshot(INVENTORY)
+
+    assert list(snapshot.select(equals={"Location": ["Cellar"]})) == [0, 1, 3]
+    assert list(snapshot.select(vintage=(2012, None))) == [0, 1]
+    assert list(snapshot.select(valuation=(None, 50))) == [0, 1]
+    assert list(snapshot.select(consume=(2025, 2026))) == [0, 1]
+    assert list(snapshot.select(equals={"Missing": ["x"]})) == []
+
+
+def test_empty_snapshot() -> None:
+    """Test that an empty inventory builds a snapshot with empty indexes."""
+    snapshot = _snapshot([])
+
+    assert len(snapshot) == 0
+    assert snapshot.distinct == {}
+    assert snapshot.search_index.search("cabernet", 10) == []
+    assert snapshot.drinking_windows.count_past_peak(2025) == 0
+
+
+def test_changes_since() -> None:
+    """Test that bottles added, removed and moved are found by iWine and Barcode."""
+    previous = _snapshot(INVENTORY)
+    current = _snapshot([
+        INVENTORY[0],
+        make_bottle(iInventory="2", Barcode="0002", Bin="B7"),
+        INVENTORY[3],
+        make_bottle(iInventory="5", Barcode="0005"),
+    ], 2)
+
+    changes = current.changes_since(previous)
+
+    assert changes.added == [3]
+    assert changes.removed == [2]
+    assert changes.moved == [(1, 1)]
+
+
+def test_changes_since_repeated_keys() -> None:
+    """Test that each bottle sharing its iWine and Barcode with others is counted."""
+    previous = _snapshot([
+        make_bottle(iInventory="1", Barcode="", Bin="A1"),
+        make_bottle(iInventory="2", Barcode="", Bin="A2"),
+        make_bottle(iInventory="3", Barcode="", Bin="A3"),
+    ])
+    current = _snapshot([
+        make_bottle(iInventory="2", Barcode="", Bin="A2"),
+        make_bottle(iInventory="3", Barcode="", Bin="C9"),
+        make_bottle(iInventory="4", Barcode="", Bin="A4"),
+        make_bottle(iInventory="5", Barcode="", Bin="A5"),
+    ], 2)
+
+    changes = current.changes_since(previous)
+
+    # A2 stayed, two of the others moved and one bottle was added.
+    assert changes.moved == [(0, 1), (2, 2)]
+    assert changes.added == [3]
+    assert changes.removed == []
+
+    changes = previous.changes_since(current)
+
+    assert changes.moved == [(1, 0), (2, 2)]
+    assert changes.added == []
+    assert changes.removed == [3]
@@ -0,0 +1,111 @@
+"""Tests for the refresh scheduling of the Home Assistant Wine Cellar integration."""
+from __future__ import annotations
+
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from custom_components.wine_cellar.scheduler import AdaptivePolling, RefreshScheduler
+
+
+def test_offsets_staggered_and_reused() -> None:
+    """Test that each account gets the first free offset."""
+    scheduler = RefreshScheduler(2, 60, 60, 3600)
+
+    assert [scheduler.async_register(entry_id) for entry_id in ("a", "b", "c")] == [0, 60, 120]
+    scheduler.async_unregister("b")
+    assert scheduler.async_register("d") == 60
+    assert scheduler.as_dict("d")["accounts"] == 3
+
+
+def test_backoff_doubles_with_jitter() -> None:
+    """Test that the retry delay doubles per failure up to the maximum, and resets on success."""
+    scheduler = RefreshScheduler(2, 60, 60, 300)
+    scheduler.async_register("a")
+
+    with patch("custom_components.wine_cellar.scheduler.random.uniform", side_effect=lambda low, high: high):
+        assert [scheduler.async_failed("a") for _ in range(5)] == [60, 120, 240, 300, 300]
+        scheduler.async_succeeded("a")
+        assert scheduler.async_failed("a") == 60
+
+    delay = scheduler.async_failed("a")
+    assert 60 <= delay <= 120
+
+
+async def test_downloads_bounded() -> None:
+    """Test that no more than the maximum number of downloads run at once."""
+    scheduler = RefreshScheduler(2, 60, 60, 3600)
+    running = peak = 0
+
+    async def download() -> None:
+        nonlocal running, peak
+        async with scheduler.async_download() as hold:
+            running += 1
+            peak = max(peak, running)
+            await hold(asyncio.ensure_future(asyncio.sleep(0.01)))
+            running -= 1
+
+    await asyncio.gather(*(download() for _ in range(5)))
+
+    assert peak == 2
+
+
+async def test_slot_held_until_abandoned_job_finishes() -> None:
+    """Test that a download that timed out keeps its slot until its job is done."""
+    scheduler = RefreshScheduler(1, 60, 60, 3600)
+    release = asyncio.Event()
+    job = asyncio.ensure_future(release.wait())
+
+    with pytest.raises(asyncio.TimeoutError):
+        async with scheduler.async_download() as hold:
+            await asyncio.wait_for(hold(job), 0.01)
+
+    entered = asyncio.Event()
+
+    async def next_download() -> None:
+        async with scheduler.async_download():
+            entered.set()
+
+    second = asyncio.ensure_future(next_download())
+    await asyncio.sleep(0.01)
+    assert not entered.is_set()
+    assert scheduler.as_dict("a")["waiting_downloads"] == 1
+
+    release.set()
+    await asyncio.wait_for(second, 1)
+    assert entered.is_set()
+
+
+def test_polling_interval_adapts_to_changes() -> None:
+    """Test that the interval doubles while the inventory is unchanged, and drops after a change."""
+    polling = AdaptivePolling(3600, 900, 21600, 10, 120, 3)
+
+    intervals = []
+    for _ in range(4):
+        polling.async_refreshed(False)
+        intervals.append(polling.interval)
+    assert intervals == [7200, 14400, 21600, 21600]
+
+    polling.async_refreshed(True)
+    assert polling.interval == 900
+    polling.async_refreshed(False)
+    polling.async_activity()
+    assert polling.interval == 900
+
+
+def test_timeout_follows_download_size() -> None:
+    """Test that the timeout starts at its maximum, then follows the expected download time."""
+    polling = AdaptivePolling(3600, 900, 21600, 10, 120, 3)
+    assert polling.timeout == 120
+
+    polling.async_downloaded(2, 1000)
+    assert polling.timeout == 10
+    polling.async_downloaded(4, 2000)
+    assert polling.timeout == 12
+    polling.async_downloaded(40, 2000)
+    assert polling.timeout == pytest.approx(3 * 2000 * (0.002 + (0.02 - 0.002) / 4))
+
+    polling.async_timed_out()
+    polling.async_timed_out()
+    assert polling.timeout == 120
@@ -0,0 +1,51 @@
+"""Tests for the full-text search index of the Home Assistant Wine Cellar integration."""
+from __future__ import annotations
+
+from custom_components.wine_cellar.search import SearchIndex, tokenize
+
+WINES = [
+    "Giacomo Conterno Barolo Sorì Cascina Francia",
+    "Chateau Margaux Pavillon Rouge",
+    "Domaine Leflaive Puligny-Montrachet",
+    "Barbaresco Produttori Rabajà",
+]
+
+
+def _index() -> SearchIndex:
+    """Return an index of the wine names, weighted the same."""
+    return SearchIndex(len(WINES), ((document, wine, 1.0) for document, wine in enumerate(WINES)))
+
+
+def test_tokenize_folds_accents_and_case() -> None:
+    """Test that text is split into folded words."""
+    assert tokenize("Sorì Cascina-FRANCIA") == ["sori", "cascina", "francia"]
+
+
+def test_search_matches_every_term() -> None:
+    """Test that documents must match all terms, in any case and accents."""
+    index = _index()
+
+    assert [document for document, _ in index.search("barolo sori", 10)] == [0]
+    assert [document for document, _ in index.search("RABAJA", 10)] == [3]
+    assert index.search("barolo margaux", 10) == []
+    assert index.search("", 10) == []
+
+
+def test_search_prefix() -> None:
+    """Test that terms of three letters or more match longer words, below exact matches."""
+    index = _index()
+
+    assert [document for document, _ in index.search("bar", 10)] == [0, 3]
+    assert index.search("bar", 10, prefix=False) == []
+    assert index.search("ba", 10) == []
+
+    [(_, exact)] = index.search("rouge", 10)
+    [(_, prefix)] = index.search("roug", 10)
+    assert prefix < exact
+
+
+def test_search_limit_keeps_best() -> None:
+    """Test that only the best scored documents are returned, ties in document order."""
+    index = SearchIndex(3, [(0, "wine", 1.0), (1, "wine", 3.0), (2, "wine", 1.0)])
+
+    assert [document for document, _ in index.search("wine", 2)] == [1, 0]
@@ -0,0 +1,234 @@
+"""Tests for the sensors and services of the Home Assistant Wine Cellar integration."""
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import HomeAssistantError, ServiceValidationError
+from homeassistant.helpers import entity_registry as er
+
+from custom_components.wine_cellar.const import (
+    CONF_SENSOR_DIMENSIONS,
+    DOMAIN,
+    SERVICE_EXPORT_INVENTORY,
+    SERVICE_GET_DISTINCT_INVENTORY,
+    SERVICE_GET_DRINKING_WINDOW,
+    SERVICE_GET_INVENTORY,
+    SERVICE_GET_SUMMARY,
+    SERVICE_GET_TOP,
+    SERVICE_GET_TYPES,
+    SERVICE_LOOKUP_BOTTLE,
+    SERVICE_REFRESH_INVENTORY,
+    SERVICE_SEARCH_INVENTORY,
+)
+
+INVENTORY_SENSOR = "sensor.cellarist_wine_inventory"
+SYNC_SENSOR = "sensor.cellarist_wine_inventory_last_synced"
+PAST_PEAK_SENSOR = "sensor.cellarist_wine_past_peak"
+PERFORMANCE_SENSOR = "sensor.cellarist_wine_cellar_get_types_duration"
+DIMENSION_SENSOR = "sensor.cellarist_wine_location_cellar"
+
+
+async def _call(hass: HomeAssistant, service: str, **data) -> dict:
+    """Call a service on the inventory sensor and return its response."""
+    response = await hass.services.async_call(
+        DOMAIN, service, {"entity_id": INVENTORY_SENSOR, **data}, blocking=True, return_response=True
+    )
+    return response[INVENTORY_SENSOR]
+
+
+@pytest.fixture
+def enable_performance_sensor(hass: HomeAssistant, config_entry: MockConfigEntry) -> None:
+    """Enable a performance sensor, which is disabled by default."""
+    config_entry.add_to_hass(hass)
+    er.async_get(hass).async_get_or_create(
+        "sensor",
+        DOMAIN,
+        "sensor_cellarist_wine_cellar_get_types_duration",
+        suggested_object_id="cellarist_wine_cellar_get_types_duration",
+        config_entry=config_entry,
+    )
+
+
+@pytest.mark.freeze_time("2025-06-01 12:00:00")
+async def test_past_peak_sensor(hass: HomeAssistant, setup_integration: MockConfigEntry) -> None:
+    """Test that the bottles whose drinking window ended before this year are counted."""
+    assert hass.states.get(PAST_PEAK_SENSOR).state == "1"
+
+
+@pytest.mark.usefixtures("enable_performance_sensor")
+@pytest.mark.parametrize("entry_options", [{CONF_SENSOR_DIMENSIONS: ["Location"]}])
+async def test_services_answered_by_inventory_sensor_only(
+    hass: HomeAssistant, setup_integration: MockConfigEntry
+) -> None:
+    """Test that services targeting every entity are only answered by the inventory sensor."""
+    response = await hass.services.async_call(
+        DOMAIN, SERVICE_GET_TYPES, {"entity_id": "all"}, blocking=True, return_response=True
+    )
+
+    assert hass.states.get(PERFORMANCE_SENSOR) is not None
+    assert hass.states.get(DIMENSION_SENSOR) is not None
+    assert list(response) == [INVENTORY_SENSOR]
+
+
+@pytest.mark.usefixtures("enable_performance_sensor")
+@pytest.mark.parametrize("entry_options", [{CONF_SENSOR_DIMENSIONS: ["Location"]}])
+@pytest.mark.parametrize("entity_id", [SYNC_SENSOR, PAST_PEAK_SENSOR, PERFORMANCE_SENSOR, DIMENSION_SENSOR])
+async def test_services_skip_other_sensors(
+    hass: HomeAssistant, setup_integration: MockConfigEntry, entity_id: str
+) -> None:
+    """Test that the other sensors of the platform are not targets of the services."""
+    with pytest.raises(HomeAssistantError, match="does not support this service"):
+        await hass.services.async_call(
+            DOMAIN, SERVICE_GET_TYPES, {"entity_id": entity_id}, blocking=True, return_response=True
+        )
+    with pytest.raises(HomeAssistantError, match="does not support this service"):
+        await hass.services.async_call(
+            DOMAIN, SERVICE_REFRESH_INVENTORY, {"entity_id": entity_id}, blocking=True
+        )
+
+
+@pytest.mark.parametrize("entry_options", [{CONF_SENSOR_DIMENSIONS: ["Location"]}])
+async def test_dimension_sensors(hass: HomeAssistant, setup_integration: MockConfigEntry) -> None:
+    """Test that a sensor is added for each location with its bottle count and value."""
+    cellar = hass.states.get(DIMENSION_SENSOR)
+    fridge = hass.states.get("sensor.cellarist_wine_location_fridge")
+
+    assert cellar.state == "3"
+    assert cellar.attributes["value_total"] == 86
+    assert fridge.state == "1"
+    assert fridge.attributes["value_total"] == 120
+
+
+async def test_search_inventory(hass: HomeAssistant, setup_integration: MockConfigEntry) -> None:
+    """Test that wines are found by words of their name or producer, once per wine."""
+    response = await _call(hass, SERVICE_SEARCH_INVENTORY, query="chateau cab")
+
+    [wine] = response["results"]
+    assert wine["Wine"] == "Chateau Test Cabernet"
+    assert wine["Quantity"] == 2
+    assert wine["score"] > 0
+
+    response = await _call(hass, SERVICE_SEARCH_INVENTORY, query="pinot", prefix=False)
+    assert [wine["iWine"] for wine in response["results"]] == ["200"]
+
+
+async def test_get_drinking_window(hass: HomeAssistant, setup_integration: MockConfigEntry) -> None:
+    """Test the bottles ready in a year, those expiring and the counts per year."""
+    response = await _call(
+        hass, SERVICE_GET_DRINKING_WINDOW, year=2021, expiring_within=1, fields=["Barcode"]
+    )
+
+    assert response["ready"] == [{"Barcode": "0001"}, {"Barcode": "0002"}, {"Barcode": "0003"}]
+    assert response["expiring"] == [{"Barcode": "0003"}]
+    assert response["past_peak"] == 0
+    assert response["per_year"][0] == {"year": 2015, "count": 1}
+    assert response["per_year"][-1] == {"year": 2030, "count": 2}
+
+    response = await _call(hass, SERVICE_GET_DRINKING_WINDOW, year=2023, expiring_within=10)
+    assert response["past_peak"] == 1
+    assert [bottle["Barcode"] for bottle in response["expiring"]] == ["0001", "0002"]
+
+
+async def test_lookup_bottle(hass: HomeAssistant, setup_integration: MockConfigEntry) -> None:
+    """Test that bottles are looked up by barcode, or by location and bin."""
+    response = await _call(hass, SERVICE_LOOKUP_BOTTLE, barcode="0003", fields=["Wine", "Bin"])
+    assert response["bottles"] == [{"Wine": "Domaine Essai Pinot Noir", "Bin": ""}]
+
+    response = await _call(hass, SERVICE_LOOKUP_BOTTLE, location="Cellar", bin="A1", fields=["Barcode"])
+    assert response["bottles"] == [{"Barcode": "0001"}, {"Barcode": "0004"}]
+
+    response = await _call(hass, SERVICE_LOOKUP_BOTTLE, barcode="0003", location="Cellar")
+    assert response["bottles"] == []
+    response = await _call(hass, SERVICE_LOOKUP_BOTTLE, barcode="9999")
+    assert response["bottles"] == []
+
+    with pytest.raises(ServiceValidationError):
+        await _call(hass, SERVICE_LOOKUP_BOTTLE, location="Cellar")
+
+
+async def test_get_top(hass: HomeAssistant, setup_integration: MockConfigEntry) -> None:
+    """Test that the bottles ranking first are returned, without those missing the value."""
+    response = await _call(hass, SERVICE_GET_TOP, limit=2, fields=["Barcode", "Valuation"])
+    assert response["top"] == [
+        {"Barcode": "0003", "Valuation": "120"},
+        {"Barcode": "0002", "Valuation": "45.6"},
+    ]
+
+    response = await _call(hass, SERVICE_GET_TOP, sort_by="Valuation", sort_order="asc", fields=["Barcode"])
+    assert response["top"] == [{"Barcode": "0001"}, {"Barcode": "0002"}, {"Barcode": "0003"}]
+
+    response = await _call(
+        hass, SERVICE_GET_TOP, sort_by="PurchaseDate", limit=1, location=["Cellar"], fields=["Barcode"]
+    )
+    assert response["top"] == [{"Barcode": "0001"}]
+
+
+async def test_export_inventory(
+    hass: HomeAssistant, setup_integration: MockConfigEntry, tmp_path: Path
+) -> None:
+    """Test that the filtered bottles are exported to a file under the configuration directory."""
+    hass.config.config_dir = str(tmp_path)
+
+    response = await _call(
+        hass, SERVICE_EXPORT_INVENTORY, format="jsonl", country=["USA"], fields=["Barcode"]
+    )
+
+    path = tmp_path / "wine_cellar" / "cellarist_inventory.jsonl"
+    assert response == {"path": str(path), "format": "jsonl", "rows": 2, "size": path.stat().st_size}
+    assert path.read_text(encoding="utf-8") == '{"Barcode": "0001"}\n{"Barcode": "0002"}\n'
+
+    with pytest.raises(ServiceValidationError, match="not a valid file name"):
+        await _call(hass, SERVICE_EXPORT_INVENTORY, filename="../secrets.yaml")
+
+
+async def test_get_inventory_filters_and_fields(hass: HomeAssistant, setup_integration: MockConfigEntry) -> None:
+    """Test that only the bottles matching every filter are returned, with the requested fields."""
+    response = await _call(hass, SERVICE_GET_INVENTORY)
+    assert len(response["inventory"]) == 4
+
+    response = await _call(hass, SERVICE_GET_INVENTORY, location=["Cellar"], color="Red", fields=["Barcode", "Bin"])
+    assert response["inventory"] == [{"Barcode": "0001", "Bin": "A1"}, {"Barcode": "0002", "Bin": "A2"}]
+
+    response = await _call(
+        hass, SERVICE_GET_INVENTORY, vintage_min=2011, valuation_max=45, fields=["Barcode"]
+    )
+    assert response["inventory"] == [{"Barcode": "0001"}]
+
+    response = await _call(hass, SERVICE_GET_INVENTORY, consume_from=2023, fields=["Barcode"])
+    assert response["inventory"] == [{"Barcode": "0001"}, {"Barcode": "0002"}]
+
+
+async def test_get_distinct_inventory(hass: HomeAssistant, setup_integration: MockConfigEntry) -> None:
+    """Test that each wine is returned once with its bottle count, in pages when a limit is given."""
+    response = await _call(hass, SERVICE_GET_DISTINCT_INVENTORY)
+    assert [(wine["iWine"], wine["Quantity"]) for wine in response["inventory"]] == [
+        ("100", 2), ("200", 1), ("300", 1),
+    ]
+
+    first = await _call(hass, SERVICE_GET_DISTINCT_INVENTORY, limit=2)
+    second = await _call(hass, SERVICE_GET_DISTINCT_INVENTORY, limit=2, cursor=first["next_cursor"])
+    assert [wine["iWine"] for wine in first["inventory"]] == ["100", "200"]
+    assert [wine["iWine"] for wine in second["inventory"]] == ["300"]
+    assert first["total"] == second["total"] == 3
+    assert second["next_cursor"] is None
+
+
+async def test_get_summary(hass: HomeAssistant, setup_integration: MockConfigEntry) -> None:
+    """Test that the metrics of each group are computed from exact values and rounded to two decimals."""
+    response = await _call(
+        hass,
+        SERVICE_GET_SUMMARY,
+        group_by=["Location"],
+        metrics=["count", "valuation_sum", "price_mean", "valuation_min"],
+        sort_by="price_mean",
+        sort_order="desc",
+    )
+
+    assert response["summary"] == [
+        {"Location": "Fridge", "count": 1, "valuation_sum": 120.0, "price_mean": 80.0, "valuation_min": 120.0},
+        {"Location": "Cellar", "count": 3, "valuation_sum": 85.6, "price_mean": 25.13, "valuation_min": 40.0},
+    ]
@@ -0,0 +1,45 @@
+"""Tests for the drinking window index of the Home Assistant Wine Cellar integration."""
+from __future__ import annotations
+
+from math import nan
+
+from custom_components.wine_cellar.windows import DrinkingWindowIndex
+
+# Bottles 0 to 5: a closed window, an inverted one, two open ones, none, and a repeat of the first.
+BEGIN = [2020, 2030, nan, 2024, nan, 2020]
+END = [2025, 2026, 2022, nan, nan, 2025]
+
+
+def test_ready_and_expiring() -> None:
+    """Test the bottles ready in a year and those whose window ends soon."""
+    index = DrinkingWindowIndex(BEGIN, END)
+
+    assert len(index) == 5
+    assert index.ready(2021) == [0, 2, 5]
+    assert index.ready(2027) == [1, 3]
+    assert index.expiring(2024, 2) == [0, 5]
+    assert index.expiring(2029, 1) == [1]
+
+
+def test_past_peak_and_counts_per_year() -> None:
+    """Test the bottles past their window, and those in their window each year."""
+    index = DrinkingWindowIndex(BEGIN, END)
+
+    assert (index.first_year, index.last_year) == (2020, 2030)
+    assert index.count_past_peak(2026) == 3
+    assert index.count_past_peak(2020) == 0
+
+    counts = index.counts_per_year()
+    assert list(counts) == list(range(2020, 2031))
+    for year, count in counts.items():
+        assert count == len(index.ready(year))
+
+
+def test_no_windows() -> None:
+    """Test an index of bottles without any drinking window."""
+    index = DrinkingWindowIndex([nan], [nan])
+
+    assert len(index) == 0
+    assert index.first_year is None
+    assert index.ready(2025) == []
+    assert index.counts_per_year() == {}